@@ -1,8 +1,19 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
 from typing import List
-from transformers import pipeline
+from transformers import TextIteratorStreamer, pipeline
+import asyncio
+import threading
 import uvicorn
+from batching import MicroBatcher, enable_padding
+from providers import get_config
+from sse import sse_response
+from tracing import instrument
+
+# --- Settings ---
+settings = get_config()["settings"]
+BATCH_SIZE = settings.get("llm_batch_size", 8)  # most requests per forward pass
+BATCH_WAIT_MS = settings.get("llm_batch_wait_ms", 20)  # how long to wait for more
 
 
 class Message(BaseModel):
@@ -15,15 +26,53 @@ class Conversation(BaseModel):
 
 
 app = FastAPI()
+tracer = instrument(app)  # request spans and GET /metrics
 
 # Load the pipeline with DeepSeek-R1
-deepseek_pipe = pipeline(
-    "text-generation", model="deepseek-ai/DeepSeek-R1", trust_remote_code=True
+deepseek_pipe = enable_padding(
+    pipeline("text-generation", model="deepseek-ai/DeepSeek-R1", trust_remote_code=True)
 )
 
 
+def generate_batch(conversations):
+    """One pipeline call for several conversations; one output per conversation."""
+    return deepseek_pipe(conversations, batch_size=len(conversations))
+
+
+# Concurrent /ask requests share forward passes instead of queueing for the model
+batcher = MicroBatcher(generate_batch, max_batch=BATCH_SIZE, max_wait_ms=BATCH_WAIT_MS)
+
+
+def stream_answer(messages):
+    """
+    Yield the answer text as the model produces it. A streamer follows a
+    single sequence, so streamed requests don't go through the batcher.
+    """
+    streamer = TextIteratorStreamer(
+        deepseek_pipe.tokenizer, skip_prompt=True, skip_special_tokens=True
+    )
+    errors = []
+
+    def generate():
+        try:
+            deepseek_pipe(messages, streamer=streamer)
+        except Exception as e:
+            errors.append(e)
+            streamer.end()  # otherwise the loop below waits forever
+
+    threading.Thread(target=generate, daemon=True).start()
+    yield from streamer
+    if errors:
+        raise errors[0]
+
+
+def chat_messages(conversation):
+    """The pipeline takes chat messages as plain role/content dicts."""
+    return [{"role": msg.role, "content": msg.content} for msg in conversation.messages]
+
+
 @app.post("/ask")
-def ask_question(conversation: Conversation):
+async def ask_question(conversation: Conversation):
     """
     Accepts JSON with a list of messages, for example:
     {
@@ -33,9 +82,8 @@ def ask_question(conversation: Conversation):
     }
     Returns a JSON object with the generated answer.
     """
-    # In principle, you can pass messages directly to the pipeline
-    messages_input = conversation.messages
-    output = deepseek_pipe(messages_input)
+    messages_input = chat_messages(conversation)
+    output = await asyncio.wrap_future(batcher.submit(messages_input))
 
     # Extract generated text from the pipeline output
     try:
@@ -46,5 +94,14 @@ def ask_question(conversation: Conversation):
     return {"answer": generated_text}
 
 
+@app.post("/ask/stream")
+def ask_question_stream(conversation: Conversation):
+    """
+    Same input as /ask. The answer is sent as Server-Sent Events, one
+    `data:` event per decoded piece of text, then `event: done`.
+    """
+    return sse_response(stream_answer(chat_messages(conversation)))
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,100 @@
+import wave
+import numpy as np
+
+
+class CaptureBuffer:
+    """
+    Preallocated buffer the sounddevice callback writes into in place.
+
+    Storage starts at `initial_seconds` of audio and doubles whenever it
+    fills up, so a long dictation costs a handful of reallocations instead
+    of one small array per callback plus a final `np.concatenate`.
+    Consumers get views of the recorded frames, never copies.
+    """
+
+    def __init__(self, sample_rate, channels=1, initial_seconds=30, dtype=np.float32):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._data = np.zeros((int(initial_seconds * sample_rate), channels), dtype)
+        self.frames = 0
+        self.high_water = 0
+
+    def __len__(self):
+        return self.frames
+
+    @property
+    def nbytes(self):
+        """Bytes of audio currently held."""
+        return self.frames * self.channels * self._data.itemsize
+
+    def clear(self):
+        """Forget the recorded frames but keep the allocation for the next take."""
+        self.frames = 0
+
+    def write(self, block):
+        """Copy a (frames, channels) block from the audio callback."""
+        n = len(block)
+        end = self.frames + n
+        if end > len(self._data):
+            self._grow(end)
+        self._data[self.frames : end] = block.reshape(n, self.channels)
+        # Publish the new length only once the samples are in place
+        self.frames = end
+        self.high_water = max(self.high_water, self.nbytes)
+
+    def view(self):
+        """(frames, channels) view of everything recorded so far."""
+        return self._data[: self.frames]
+
+    def mono(self):
+        """1-D view of the first channel."""
+        return self._data[: self.frames, 0]
+
+    # Same addressing as streaming.AudioRingBuffer so the streaming
+    # transcriber can read straight from the capture buffer.
+    @property
+    def total_written(self):
+        return self.frames
+
+    def oldest(self):
+        return 0
+
+    def read(self, start, end):
+        """1-D view of frames [start, end) of the first channel."""
+        return self._data[max(start, 0) : min(end, self.frames), 0]
+
+    def _grow(self, needed):
+        capacity = len(self._data)
+        while capacity < needed:
+            capacity *= 2
+        data = np.zeros((capacity, self.channels), self._data.dtype)
+        data[: self.frames] = self._data[: self.frames]
+        self._data = data
+
+
+def write_wav(path, audio, sample_rate, chunk_seconds=1):
+    """Write float32 audio as 16-bit PCM, converting one chunk at a time."""
+    if audio.ndim == 1:
+        audio = audio[:, None]
+    chunk = int(chunk_seconds * sample_rate)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(audio.shape[1])
+        wf.setsampwidth(2)  # 16-bit
+        wf.setframerate(sample_rate)
+        for start in range(0, len(audio), chunk):
+            block = audio[start : start + chunk] * 32767
+            wf.writeframes(block.astype(np.int16).tobytes())
+
+
+def read_wav(path):
+    """Mono float32 audio and its sample rate from a 16-bit PCM WAV file."""
+    with wave.open(path, "rb") as wf:
+        rate, channels = wf.getframerate(), wf.getnchannels()
+        if wf.getsampwidth() != 2:
+            raise ValueError(
+                f"{path}: {wf.getsampwidth() * 8}-bit samples, only 16-bit PCM "
+                "is supported"
+            )
+        frames = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    audio = frames.reshape(-1, channels).mean(axis=1, dtype=np.float32) / 32768
+    return audio, rate
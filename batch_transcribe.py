@@ -0,0 +1,154 @@
+"""
+Transcribe a whole directory of recordings offline.
+
+Every .wav file under DIRECTORY is transcribed by a pool of worker
+processes, each of which loads the model once. Results are appended to a
+JSONL file (one object per recording) as soon as each one finishes, so an
+interrupted run can simply be started again: recordings already in the
+output are skipped. Failed recordings are written with an "error" field
+and retried on the next run.
+
+The backend, model size and language default to the config.yaml settings
+(stt_backend, whisper_model, language).
+
+Usage:
+    python batch_transcribe.py DIRECTORY [--output transcriptions/batch.jsonl]
+                               [--workers N] [--threads N] [--pattern *.wav]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import pathlib
+import time
+from audio_buffer import read_wav
+from resample import WHISPER_SAMPLE_RATE, to_whisper_rate
+from stt_backends import DEFAULT_BACKEND
+
+REPORT_EVERY = 10  # files between progress lines
+
+# --- Per worker process ---
+model = None
+
+
+def load_model(backend, model_size, language, threads):
+    global model
+    from stt_backends import load_backend
+
+    model = load_backend(backend, model_size, language, threads)
+
+
+def transcribe_file(path):
+    """One JSONL record for `path`; runs in a worker process."""
+    try:
+        audio = to_whisper_rate(*read_wav(path))
+        start = time.perf_counter()
+        result = model.transcribe(audio)
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "path": path,
+        "duration": round(len(audio) / WHISPER_SAMPLE_RATE, 3),
+        "seconds": round(elapsed, 3),
+        "language": result["language"],
+        "text": result["text"].strip(),
+    }
+
+
+def transcribe_array(audio, sample_rate=WHISPER_SAMPLE_RATE):
+    """Transcript of mono float32 `audio`; runs in a worker process."""
+    return model.transcribe(to_whisper_rate(audio, sample_rate))["text"].strip()
+
+
+def already_done(output):
+    """Paths that already have a successful record in `output`."""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interrupted run
+            if "error" not in record:
+                done.add(record["path"])
+    return done
+
+
+def report(done, failed, audio_seconds, model_seconds, started, total):
+    wall = time.perf_counter() - started
+    rtf = model_seconds / audio_seconds if audio_seconds else 0.0
+    print(
+        f"{done + failed}/{total} files ({failed} failed), "
+        f"{(done + failed) / wall:.2f} files/s, "
+        f"RTF {rtf:.3f} per worker, "
+        f"{audio_seconds / wall:.1f} s of audio per second overall"
+    )
+
+
+def main():
+    from providers import get_config
+
+    settings = get_config()["settings"]
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directory")
+    parser.add_argument("--output", default="transcriptions/batch.jsonl")
+    parser.add_argument("--pattern", default="*.wav")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--threads", type=int, default=1, help="CPU threads per worker")
+    parser.add_argument(
+        "--backend", default=settings.get("stt_backend", DEFAULT_BACKEND)
+    )
+    parser.add_argument("--model", default=settings.get("whisper_model", "base"))
+    parser.add_argument("--language", default=settings.get("language"))
+    args = parser.parse_args()
+
+    files = sorted(
+        str(p) for p in pathlib.Path(args.directory).rglob(args.pattern) if p.is_file()
+    )
+    done = already_done(args.output)
+    todo = [path for path in files if path not in done]
+    print(
+        f"{len(files)} recordings, {len(files) - len(todo)} already done, "
+        f"{len(todo)} to go on {args.workers} workers"
+    )
+    if not todo:
+        return
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    if os.path.exists(args.output) and os.path.getsize(args.output):
+        with open(args.output, "rb+") as f:
+            # A run killed mid-write leaves a partial line; don't append to it
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    ok = failed = 0
+    audio_seconds = model_seconds = 0.0
+    started = time.perf_counter()
+    with multiprocessing.Pool(
+        args.workers,
+        initializer=load_model,
+        initargs=(args.backend, args.model, args.language, args.threads),
+    ) as pool, open(args.output, "a", encoding="utf-8") as out:
+        for record in pool.imap_unordered(transcribe_file, todo):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            if "error" in record:
+                failed += 1
+                print(f"{record['path']}: {record['error']}")
+            else:
+                ok += 1
+                audio_seconds += record["duration"]
+                model_seconds += record["seconds"]
+            if (ok + failed) % REPORT_EVERY == 0:
+                report(ok, failed, audio_seconds, model_seconds, started, len(todo))
+
+    report(ok, failed, audio_seconds, model_seconds, started, len(todo))
+    print(f"Results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+
+class MicroBatcher:
+    """
+    Collect single requests into batches for a model that runs faster on
+    many inputs at once.
+
+    `submit(item)` returns a Future right away. A worker thread waits for
+    the first item, then keeps collecting until it has `max_batch` items or
+    `max_wait_ms` has passed since that first one, calls
+    `run_batch(items)` once and hands each result (same order as `items`)
+    to its own Future. If `run_batch` raises, every Future in the batch
+    gets the exception.
+    """
+
+    def __init__(self, run_batch, max_batch=8, max_wait_ms=10):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    @property
+    def mean_batch_size(self):
+        return self.items / self.batches if self.batches else 0.0
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # Take whatever is already queued even once the wait is over
+                batch.append(self._queue.get(timeout=max(remaining, 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = self.run_batch(items)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+
+def enable_padding(pipe):
+    """
+    Let a transformers text-generation pipeline pad batches: decoder-only
+    models need a pad token (reuse EOS) and padding on the left, so every
+    prompt ends right where generation starts.
+    """
+    tokenizer = pipe.tokenizer
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+    if pipe.model.config.pad_token_id is None:
+        pipe.model.config.pad_token_id = tokenizer.pad_token_id
+    return pipe
@@ -0,0 +1,93 @@
+"""
+Throughput versus latency of micro-batched text generation on the CPU.
+
+Runs a small text-generation model behind a MicroBatcher for each
+batch size / wait time combination and has `--clients` threads send
+`--requests` prompts in a closed loop (each client waits for its answer
+before sending the next). Batch size 1 is the old one-request-per-call
+behaviour.
+
+Usage:
+    python bench_batching.py [--model distilgpt2] [--clients 16]
+                             [--requests 64] [--batch-sizes 1 4 8 16]
+                             [--waits 5 20]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import time
+import numpy as np
+from batching import MicroBatcher, enable_padding
+
+PROMPTS = [
+    "The quickest way to learn a new language is",
+    "Once upon a time, in a small village,",
+    "The main advantage of batching requests is",
+    "My favourite thing about the weekend is",
+]
+
+
+def run(pipe, batch_size, wait_ms, clients, total, max_new_tokens):
+    """Requests per second, per-request latencies and the mean batch size."""
+
+    def generate_batch(prompts):
+        return pipe(
+            prompts,
+            batch_size=len(prompts),
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+        )
+
+    batcher = MicroBatcher(generate_batch, max_batch=batch_size, max_wait_ms=wait_ms)
+    latencies = []
+
+    def client(n):
+        for i in range(n):
+            start = time.perf_counter()
+            batcher.submit(PROMPTS[i % len(PROMPTS)]).result()
+            latencies.append(time.perf_counter() - start)
+
+    per_client = [total // clients + (i < total % clients) for i in range(clients)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(client, per_client))
+    elapsed = time.perf_counter() - start
+    return total / elapsed, latencies, batcher.mean_batch_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--max-new-tokens", type=int, default=24)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--waits", type=float, nargs="+", default=[5, 20])
+    args = parser.parse_args()
+
+    from transformers import pipeline
+
+    pipe = enable_padding(pipeline("text-generation", model=args.model, device="cpu"))
+    pipe(PROMPTS[0], max_new_tokens=2)  # load weights and warm up
+
+    print(f"{args.model}, {args.clients} clients, {args.requests} requests")
+    print("batch  wait ms   req/s   mean batch   p50 s   p95 s")
+    for batch_size in args.batch_sizes:
+        for wait_ms in args.waits if batch_size > 1 else [0]:
+            throughput, latencies, mean_batch = run(
+                pipe,
+                batch_size,
+                wait_ms,
+                args.clients,
+                args.requests,
+                args.max_new_tokens,
+            )
+            p50, p95 = np.percentile(latencies, [50, 95])
+            print(
+                f"{batch_size:5d}  {wait_ms:7.0f}  {throughput:6.2f}"
+                f"   {mean_batch:10.1f}  {p50:6.2f}  {p95:6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
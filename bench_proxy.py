@@ -0,0 +1,141 @@
+"""
+Load test for the FastAPI proxies against a local fake upstream.
+
+Starts fake_hf_server.py with a fixed `--latency`, points the chosen app's
+HF_API_URL at it, serves the app in-process and fires `--requests` POSTs
+at /ask with `--concurrency` in flight. Every question is different, so
+the response cache never answers for the upstream.
+
+With the upstream taking L seconds, the best possible throughput is about
+min(concurrency, proxy_concurrency) / L requests per second.
+
+Usage:
+    python bench_proxy.py [--app hugging_face_api] [--requests 1000]
+                          [--concurrency 200] [--latency 0.5]
+"""
+
+import argparse
+import asyncio
+import importlib
+import subprocess
+import sys
+import threading
+import time
+import httpx
+import numpy as np
+import uvicorn
+
+UPSTREAM_PORT = 8003
+PROXY_PORT = 8010
+
+
+def request_body(app_name, i):
+    question = f"Question number {i}: what is {i} squared?"
+    if app_name == "hugging_face_api":
+        return {"messages": [{"role": "user", "content": question}]}
+    return {"question": question}
+
+
+def wait_until_up(url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.05)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def serve_in_background(app, port):
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app,
+            host="127.0.0.1",
+            port=port,
+            log_level="warning",
+            # Don't drop idle client connections mid-run
+            timeout_keep_alive=60,
+        )
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def fire(app_name, total, concurrency):
+    """Latency of every request, and how many failed."""
+    url = f"http://127.0.0.1:{PROXY_PORT}/ask"
+    limits = httpx.Limits(max_connections=concurrency)
+    slots = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+
+        async def one(i):
+            nonlocal failures
+            async with slots:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json=request_body(app_name, i))
+                    response.raise_for_status()
+                except httpx.HTTPError as e:
+                    failures += 1
+                    print(f"Request {i} failed: {e!r}")
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--app",
+        default="hugging_face_api",
+        choices=["hugging_face_api", "hugging_face_request"],
+    )
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    upstream = subprocess.Popen(
+        [
+            sys.executable,
+            "fake_hf_server.py",
+            "--port",
+            str(UPSTREAM_PORT),
+            "--latency",
+            str(args.latency),
+        ]
+    )
+    try:
+        wait_until_up(f"http://127.0.0.1:{UPSTREAM_PORT}/health")
+        proxy = importlib.import_module(args.app)
+        proxy.HF_API_URL = f"http://127.0.0.1:{UPSTREAM_PORT}/models/fake"
+        server = serve_in_background(proxy.app, PROXY_PORT)
+
+        start = time.perf_counter()
+        latencies, failures = asyncio.run(
+            fire(args.app, args.requests, args.concurrency)
+        )
+        elapsed = time.perf_counter() - start
+        server.should_exit = True
+    finally:
+        upstream.terminate()
+        upstream.wait()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0, 0, 0)
+    print(
+        f"{args.app}: {len(latencies)} ok, {failures} failed in {elapsed:.2f} s "
+        f"-> {len(latencies) / elapsed:.1f} req/s at concurrency {args.concurrency}"
+    )
+    print(f"latency p50 {p50:.3f} s, p95 {p95:.3f} s, p99 {p99:.3f} s")
+    print(f"upstream latency {args.latency:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
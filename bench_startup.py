@@ -0,0 +1,88 @@
+"""
+Measure how quickly the GUI entry points get a window on screen.
+
+For each GUI module this starts a fresh interpreter and reports:
+  window:  process start -> first window painted
+  capture: process start -> record button enabled (capture backend loaded)
+and the slowest imports on the way to the first window, from -X importtime.
+
+Usage:
+    python bench_startup.py [--repeat N] [--top N] [gui recorder_gui ...]
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+PROBE = """
+import time
+start = time.perf_counter()
+import {module} as gui
+root = gui.build_window()
+root.update()
+print("window", time.perf_counter() - start, flush=True)
+while not gui.capture_ready.is_set():
+    root.update()
+    time.sleep(0.005)
+print("capture", time.perf_counter() - start, flush=True)
+root.destroy()
+"""
+
+
+def time_to_window(module):
+    """Wall-clock seconds from process start to first window and to capture."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    marks = {}
+    for line in proc.stdout:
+        name, _ = line.split()
+        marks[name] = time.perf_counter() - start
+    proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{module} exited with {proc.returncode}")
+    return marks["window"], marks["capture"]
+
+
+def slowest_imports(module, top):
+    """Top-level imports of `module` sorted by cumulative import time (us)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Nested imports are indented two spaces per level under `module`
+        if name.startswith("   ") and not name.startswith("     "):
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=["gui", "recorder_gui"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [time_to_window(module) for _ in range(args.repeat)]
+        window = min(r[0] for r in runs)
+        capture = min(r[1] for r in runs)
+        print(
+            f"{module}: window {window * 1000:.0f} ms, capture {capture * 1000:.0f} ms"
+        )
+        for cumulative, name in slowest_imports(module, args.top):
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
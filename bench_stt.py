@@ -0,0 +1,75 @@
+"""
+Real-time factor of each speech-to-text backend on this CPU.
+
+Loads every backend in turn with the same model size, thread count and
+language, transcribes the same audio `--repeat` times and reports the
+best time divided by the audio length (RTF < 1 is faster than real time),
+plus the load time.
+
+Without --wav a synthetic voice-like clip is used: fine for timing, but
+the transcripts are meaningless. Recordings in transcriptions/ work well.
+
+Usage:
+    python bench_stt.py [--wav transcriptions/voce.wav] [--seconds 30]
+                        [--model base] [--threads 0] [--language en]
+                        [--backends faster-whisper openai-whisper]
+"""
+
+import argparse
+import time
+import numpy as np
+from audio_buffer import read_wav
+from resample import to_whisper_rate
+from stt_backends import BACKENDS, load_backend
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_clip(seconds, sample_rate=SAMPLE_RATE):
+    """Speech-band noise with a slow envelope, roughly like a voice."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    return (0.1 * envelope * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--wav")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    args = parser.parse_args()
+
+    if args.wav:
+        audio = to_whisper_rate(*read_wav(args.wav))
+    else:
+        audio = synthetic_clip(args.seconds)
+    duration = len(audio) / SAMPLE_RATE
+    print(
+        f"{duration:.1f} s of audio, model {args.model}, "
+        f"threads {args.threads or 'default'}, language {args.language}"
+    )
+    print(f"{'backend':>15} {'load s':>7} {'best s':>7} {'RTF':>6}  text")
+
+    for name in args.backends:
+        start = time.perf_counter()
+        backend = load_backend(name, args.model, args.language, args.threads)
+        load = time.perf_counter() - start
+
+        best, text = float("inf"), ""
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            text = backend.transcribe(audio)["text"]
+            best = min(best, time.perf_counter() - start)
+        print(
+            f"{name:>15} {load:>7.2f} {best:>7.2f} {best / duration:>6.3f}"
+            f"  {text.strip()[:50]!r}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Throughput versus latency of batched Whisper transcription on the CPU.
+
+Loads one backend and, for each batch size / wait time combination, puts
+it behind a BatchedTranscriber and has `--clients` threads transcribe
+`--requests` clips in a closed loop (each client waits for its transcript
+before sending the next), like that many voice sessions sharing a server.
+Batch size 1 is one clip per encoder pass, as before.
+
+Reported per combination: audio seconds transcribed per wall second,
+mean batch size and occupancy (mean size / batch size), the mean time
+segments queued for their batch and per-request latency.
+
+Usage:
+    python bench_stt_batching.py [--wav transcriptions/voce.wav] [--seconds 5]
+                                 [--backend faster-whisper] [--model base]
+                                 [--clients 8] [--requests 32]
+                                 [--batch-sizes 1 2 4 8] [--waits 20 100]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import time
+import numpy as np
+from audio_buffer import read_wav
+from bench_stt import synthetic_clip
+from resample import WHISPER_SAMPLE_RATE, to_whisper_rate
+from stt_backends import BACKENDS, load_backend
+from stt_batching import BatchedTranscriber
+
+
+def run(backend, batch_size, wait_ms, clients, total, audio):
+    """Audio seconds per second, per-request latencies and the batcher's stats."""
+    model = BatchedTranscriber(backend, max_batch=batch_size, max_wait_ms=wait_ms)
+    latencies = []
+
+    def client(n):
+        for _ in range(n):
+            start = time.perf_counter()
+            model.transcribe(audio, without_timestamps=True)
+            latencies.append(time.perf_counter() - start)
+
+    per_client = [total // clients + (i < total % clients) for i in range(clients)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(client, per_client))
+    elapsed = time.perf_counter() - start
+    audio_seconds = total * len(audio) / WHISPER_SAMPLE_RATE
+    return audio_seconds / elapsed, latencies, model.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--wav")
+    parser.add_argument("--seconds", type=float, default=5, help="synthetic clip")
+    parser.add_argument("--backend", default="faster-whisper", choices=BACKENDS)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--waits", type=float, nargs="+", default=[20, 100])
+    args = parser.parse_args()
+
+    if args.wav:
+        audio = to_whisper_rate(*read_wav(args.wav))
+    else:
+        audio = synthetic_clip(args.seconds)
+    backend = load_backend(args.backend, args.model, args.language, args.threads)
+    backend.transcribe_batch([audio])  # load weights and warm up
+
+    print(
+        f"{args.backend} {args.model}, {len(audio) / WHISPER_SAMPLE_RATE:.1f} s clips, "
+        f"{args.clients} clients, {args.requests} requests"
+    )
+    print(
+        "batch  wait ms   audio s/s   mean batch   occupancy   queued ms   p50 s   p95 s"
+    )
+    for batch_size in args.batch_sizes:
+        for wait_ms in args.waits if batch_size > 1 else [0]:
+            throughput, latencies, stats = run(
+                backend, batch_size, wait_ms, args.clients, args.requests, audio
+            )
+            p50, p95 = np.percentile(latencies, [50, 95])
+            print(
+                f"{batch_size:5d}  {wait_ms:7.0f}  {throughput:10.2f}"
+                f"   {stats['mean_batch_size']:10.1f}  {stats['occupancy']:10.0%}"
+                f"  {stats['mean_queued_ms']:10.0f}  {p50:6.2f}  {p95:6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
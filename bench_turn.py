@@ -0,0 +1,317 @@
+"""
+Headless end-to-end benchmark of a voice turn against local stand-ins.
+
+Starts fake_hf_server.py and fake_tts_server.py, points the Hugging Face
+and ElevenLabs clients at them and, for every fixture WAV, runs gui.py's
+own turn stages without microphone or speakers:
+
+    transcribe_stage (WAV archive, configured STT backend)
+    -> answer_stage (streamed LLM answer, split into sentences)
+    -> speak_stage (streamed PCM for each sentence, sent to a null sink)
+
+The fixture goes in as a recorded take with its VAD, as if the user had
+stopped talking; live streaming transcription is not exercised. The answer
+and speech overlap as they do in the GUI. Every turn is timed per stage
+from the turn's marks and the tracer's spans; CPU time and peak RSS are
+measured for this process and for the fake servers (the larger of the
+two). The results are written as JSON, with the git commit, so runs on
+different commits can be compared with --compare.
+
+Without fixtures, synthetic voice-like clips are used: the transcripts are
+then whatever Whisper makes of noise, which is fine for timing.
+
+Usage:
+    python bench_turn.py [FIXTURE.wav ...] [--runs 3] [--output bench.json]
+                         [--llm-latency 0.3] [--token-latency 0.02]
+                         [--answer-words 40] [--tts-latency 0.2]
+                         [--realtime] [--tts-cache] [--compare previous.json]
+"""
+
+from functools import partial
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from audio_buffer import CaptureBuffer, read_wav
+from bench_proxy import wait_until_up
+from bench_stt import SAMPLE_RATE, synthetic_clip
+from vad import EnergyVAD
+
+HF_PORT = 8003
+TTS_PORT = 8002
+
+
+class NullSink:
+    """Stands in for the sound card in player.play_pcm."""
+
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, data):
+        if self.realtime:
+            import player
+
+            time.sleep(len(data) / 2 / player.PCM_RATE)
+
+
+def start_fakes(args):
+    servers = [
+        [
+            "fake_hf_server.py",
+            "--port",
+            str(HF_PORT),
+            "--latency",
+            str(args.llm_latency),
+            "--token-latency",
+            str(args.token_latency),
+            "--answer-words",
+            str(args.answer_words),
+        ],
+        [
+            "fake_tts_server.py",
+            "--port",
+            str(TTS_PORT),
+            "--latency",
+            str(args.tts_latency),
+        ],
+    ]
+    procs = [subprocess.Popen([sys.executable, *cmd]) for cmd in servers]
+    wait_until_up(f"http://127.0.0.1:{HF_PORT}/health")
+    wait_until_up(f"http://127.0.0.1:{TTS_PORT}/docs")
+    return procs
+
+
+def configure(args, trace_path):
+    """Point the shared config at the fakes before the pipeline modules load."""
+    from providers import get_config
+
+    settings = get_config()["settings"]
+    settings.update(
+        hf_url=f"http://127.0.0.1:{HF_PORT}",
+        elevenlabs_url=f"http://127.0.0.1:{TTS_PORT}",
+        response_cache=False,  # every run should do the work
+        trace_file=trace_path,  # the stage spans are read back from here
+    )
+    if args.stt_backend:
+        settings["stt_backend"] = args.stt_backend
+
+
+def recorded_take(audio, sample_rate):
+    """The take gui.stop_recording would hand over for `audio`."""
+    import gui
+
+    buffer = CaptureBuffer(sample_rate)
+    buffer.write(audio)
+    take_vad = None
+    if gui.VAD:
+        take_vad = EnergyVAD(
+            sample_rate,
+            threshold_db=gui.VAD_THRESHOLD_DB,
+            silence_seconds=gui.VAD_SILENCE_SECONDS,
+        )
+        take_vad.process(audio)
+    # Nothing to flush without a microphone: no stop latency
+    return buffer, take_vad, None, None, len(audio) / sample_rate, 0.0
+
+
+def read_spans(trace_path, trace):
+    """The spans recorded for one turn, by name (several for "tts")."""
+    spans = {}
+    with open(trace_path, "r", encoding="utf-8") as f:
+        for line in f:
+            span = json.loads(line)
+            if span["trace"] == trace:
+                spans.setdefault(span["span"], []).append(span)
+    return spans
+
+
+def run_turn(number, audio, sample_rate, trace_path):
+    """Stage timings (ms since the turn started) and sizes for one turn."""
+    import gui
+    from turn_executor import Turn
+
+    gui.SAMPLE_RATE = sample_rate
+    take = recorded_take(audio, sample_rate)
+    cpu = time.process_time()
+    turn = Turn(number)
+    value = take
+    # The executor's stage loop, on one thread
+    for _, stage, *_ in gui.TURN_STAGES:
+        value = stage(turn, value)
+        turn.mark(stage.__name__)
+    turn.mark("total")
+
+    marks = {name: seconds * 1000 for name, seconds in turn.marks.items()}
+    spans = read_spans(trace_path, number)
+    return {
+        "audio_seconds": round(len(audio) / sample_rate, 3),
+        "transcript_chars": sum(s.get("chars", 0) for s in spans.get("stt", [])),
+        "tts_bytes": sum(s.get("bytes", 0) for s in spans.get("tts", [])),
+        "cpu_seconds": round(time.process_time() - cpu, 3),
+        "marks_ms": {k: round(v, 1) for k, v in marks.items()},
+        "stages_ms": stage_durations(marks, spans),
+    }
+
+
+def stage_durations(marks, spans):
+    """How long each stage took, from the turn's marks and spans."""
+
+    def mark(name):
+        return marks.get(name, marks["total"])
+
+    def span_ms(name, attribute="duration_ms"):
+        found = spans.get(name) or [{}]
+        value = found[0].get(attribute, 0.0)
+        return value * 1000 if attribute.endswith("_seconds") else value
+
+    transcribed = mark("transcribe_stage")
+    return {
+        "save": round(span_ms("wav_write"), 1),
+        "stt": round(span_ms("stt"), 1),
+        "llm_first_token": round(span_ms("llm", "first_item_seconds"), 1),
+        "llm": round(span_ms("llm"), 1),
+        "first_audio": round(mark("first audio") - transcribed, 1),
+        "speak": round(mark("total") - transcribed, 1),
+        "time_to_first_audio": round(mark("first audio"), 1),
+        "end_to_end": round(mark("total"), 1),
+    }
+
+
+def summarize(turns):
+    """p50/p95 and mean of every stage over all turns."""
+    summary = {}
+    for stage in turns[0]["stages_ms"]:
+        values = [t["stages_ms"][stage] for t in turns]
+        p50, p95 = np.percentile(values, [50, 95])
+        summary[stage] = {
+            "p50": round(float(p50), 1),
+            "p95": round(float(p95), 1),
+            "mean": round(float(np.mean(values)), 1),
+        }
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, path):
+    with open(path, "r") as f:
+        previous = json.load(f)
+    print(f"\nvs {previous.get('commit')} (p50 ms):")
+    for stage, stats in current["summary"].items():
+        before = previous["summary"].get(stage, {}).get("p50")
+        if before is None:
+            continue
+        change = (stats["p50"] - before) / before * 100 if before else 0.0
+        print(f"  {stage:>20} {before:9.1f} -> {stats['p50']:9.1f}  {change:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("fixtures", nargs="*", help="WAV files (default: synthetic)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", default="bench_turn.json")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--answer-words", type=int, default=40)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--stt-backend", help="override settings.stt_backend")
+    parser.add_argument(
+        "--tts-cache", action="store_true", help="keep the TTS audio cache on"
+    )
+    parser.add_argument(
+        "--realtime", action="store_true", help="pace the null sink like speakers"
+    )
+    parser.add_argument("--compare", help="earlier results JSON to compare with")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = [(os.path.basename(p), *read_wav(p)) for p in args.fixtures]
+    else:
+        fixtures = [
+            (f"synthetic_{s}s", synthetic_clip(s), SAMPLE_RATE) for s in (3, 8, 15)
+        ]
+
+    workdir = tempfile.mkdtemp()
+    trace_path = os.path.join(workdir, "trace.jsonl")
+    servers = start_fakes(args)
+    try:
+        configure(args, trace_path)
+        import gui
+        import player
+
+        # Take the GUI's turn path, minus the devices and the files it keeps
+        gui.TRANSCRIPTION_SERVER = None  # time the configured backend here
+        gui.OUTPUT_WAV = os.path.join(workdir, "turn.wav")
+        gui.TRANSCRIPTION_FILE = os.path.join(workdir, "transcription.txt")
+        player.STREAM_TTS = True  # MP3 playback would need speakers
+        player.open_output = partial(NullSink, args.realtime)
+        if not args.tts_cache:
+            player.cache = None  # otherwise every run after the first is a hit
+
+        started = time.perf_counter()
+        gui.load_pipeline()
+        load_seconds = time.perf_counter() - started
+
+        turns = []
+        for run in range(args.runs):
+            for name, audio, sample_rate in fixtures:
+                turn = run_turn(len(turns) + 1, audio, sample_rate, trace_path)
+                turn.update(fixture=name, run=run)
+                turns.append(turn)
+                print(
+                    f"{name} run {run}: first audio "
+                    f"{turn['stages_ms']['time_to_first_audio']:.0f} ms, "
+                    f"end to end {turn['stages_ms']['end_to_end']:.0f} ms"
+                )
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": vars(args),
+        "model_load_seconds": round(load_seconds, 3),
+        "cpu_seconds": round(own.ru_utime + own.ru_stime, 3),
+        "fake_servers_cpu_seconds": round(children.ru_utime + children.ru_stime, 3),
+        "peak_rss_mb": round(own.ru_maxrss / 1024, 1),  # ru_maxrss is in KiB
+        # For waited-for children, the peak of the largest one
+        "fake_servers_peak_rss_mb": round(children.ru_maxrss / 1024, 1),
+        "summary": summarize(turns),
+        "turns": turns,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(json.dumps({k: v for k, v in results.items() if k != "turns"}, indent=2))
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Load test for voice_server.py: N simulated speakers talking at once.
+
+Every speaker opens its own session and, for each turn, streams a fixture
+WAV in 20 ms frames at real time (or --speed times faster), says "end"
+and waits for the whole answer before speaking again. The server's own
+end-pointing is turned off, so a fixture with pauses in it is still one
+turn, the one its "end" closes. Reported per turn,
+from the end of speech: time to the transcript, the first sentence, the
+first audio and the end of the turn (p50/p95/p99), plus turns per second
+over all sessions.
+
+Needs the `websockets` package (pip install websockets). Start the
+server first, e.g. against the local stand-ins (with hf_url and
+elevenlabs_url pointing at them in config.yaml):
+    python fake_hf_server.py &
+    python fake_tts_server.py &
+    python voice_server.py --workers 4 &
+    python bench_voice_server.py --sessions 16 [FIXTURE.wav ...]
+
+Usage:
+    python bench_voice_server.py [FIXTURE.wav ...] [--sessions 8] [--turns 3]
+                                 [--speed 1.0] [--no-answer] [--no-speak]
+                                 [--url ws://127.0.0.1:8004/session]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import numpy as np
+from audio_buffer import read_wav
+from bench_stt import synthetic_clip
+from resample import WHISPER_SAMPLE_RATE, to_whisper_rate
+
+try:
+    import websockets
+except ImportError:
+    sys.exit(
+        "bench_voice_server.py needs the websockets package: pip install websockets"
+    )
+
+FRAME_SECONDS = 0.02
+STAGGER_SECONDS = 0.05  # between session starts
+METRICS = ["transcript", "first_sentence", "first_audio", "turn_end"]
+
+
+async def send_audio(ws, audio, speed):
+    """Stream `audio` in frames, paced like a microphone `speed` times over."""
+    frame = int(FRAME_SECONDS * WHISPER_SAMPLE_RATE)
+    started = time.perf_counter()
+    for i, start in enumerate(range(0, len(audio), frame)):
+        await ws.send(audio[start : start + frame].tobytes())
+        if speed:
+            delay = started + (i + 1) * FRAME_SECONDS / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    await ws.send(json.dumps({"type": "end"}))
+
+
+async def speaker(url, fixtures, turns, speed, delay, results):
+    await asyncio.sleep(delay)
+    async with websockets.connect(url, max_size=None) as ws:
+        json.loads(await ws.recv())  # ready
+        for turn in range(turns):
+            await send_audio(ws, fixtures[turn % len(fixtures)], speed)
+            ended = time.perf_counter()
+            latencies = {}
+            while "turn_end" not in latencies:
+                message = await ws.recv()
+                elapsed = (time.perf_counter() - ended) * 1000
+                if isinstance(message, bytes):
+                    latencies.setdefault("first_audio", elapsed)
+                    continue
+                message = json.loads(message)
+                if message["type"] == "error":
+                    results["errors"].append(message["message"])
+                    latencies["turn_end"] = None
+                elif message["type"] == "sentence":
+                    latencies.setdefault("first_sentence", elapsed)
+                else:
+                    latencies.setdefault(message["type"], elapsed)
+            if latencies["turn_end"] is not None:
+                results["turns"].append(latencies)
+
+
+def report(results, wall):
+    turns = results["turns"]
+    print(
+        f"{len(turns)} turns in {wall:.1f} s ({len(turns) / wall:.2f} turns/s), "
+        f"{len(results['errors'])} errors"
+    )
+    print(f"{'ms after speech':>16} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for metric in METRICS:
+        values = [t[metric] for t in turns if metric in t]
+        if values:
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            print(f"{metric:>16} {p50:8.0f} {p95:8.0f} {p99:8.0f}")
+    for error in sorted(set(results["errors"])):
+        print(f"Error: {error}")
+
+
+async def run(args, fixtures):
+    query = f"?sample_rate={WHISPER_SAMPLE_RATE}&endpointing=false"
+    if args.no_answer:
+        query += "&answer=false"
+    if args.no_speak:
+        query += "&speak=false"
+    results = {"turns": [], "errors": []}
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(
+            speaker(
+                args.url + query,
+                fixtures[i % len(fixtures) :] + fixtures[: i % len(fixtures)],
+                args.turns,
+                args.speed,
+                i * STAGGER_SECONDS,
+                results,
+            )
+            for i in range(args.sessions)
+        ),
+        return_exceptions=True,
+    )
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            results["errors"].append(f"{type(outcome).__name__}: {outcome}")
+    report(results, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("fixtures", nargs="*", help="WAV files (default: synthetic)")
+    parser.add_argument("--url", default="ws://127.0.0.1:8004/session")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=3, help="per session")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="times real time, 0 = unpaced"
+    )
+    parser.add_argument("--no-answer", action="store_true", help="only transcribe")
+    parser.add_argument("--no-speak", action="store_true", help="answer without audio")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = [to_whisper_rate(*read_wav(path)) for path in args.fixtures]
+    else:
+        fixtures = [synthetic_clip(s) for s in (3, 8, 15)]
+    asyncio.run(run(args, fixtures))
+
+
+if __name__ == "__main__":
+    main()
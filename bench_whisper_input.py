@@ -0,0 +1,95 @@
+"""
+Compare how long it takes to get a recording into Whisper-ready form.
+
+old:       list of chunks -> np.concatenate -> int16 WAV on disk -> ffmpeg
+           decode/resample (whisper.load_audio), as the GUIs used to do
+16k:       capture buffer recorded at 16 kHz, handed over as a view
+resample:  capture buffer recorded at 44.1 kHz, resampled in memory
+
+Usage:
+    python bench_whisper_input.py [--transcribe] [--repeat N]
+
+With --transcribe the Whisper "base" model is run on each input too, so the
+end-to-end numbers include the model time.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import wave
+import numpy as np
+import whisper
+from audio_buffer import CaptureBuffer
+from resample import to_whisper_rate
+
+DURATIONS = [5, 30, 120]
+BLOCK = 512  # frames per simulated sounddevice callback
+
+
+def synthetic_clip(seconds, sample_rate):
+    """Speech-band noise with a slow envelope, roughly like a voice."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    return (0.1 * envelope * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def old_path(clip, sample_rate, wav_path):
+    chunks = [clip[i : i + BLOCK, None].copy() for i in range(0, len(clip), BLOCK)]
+    audio = np.concatenate(chunks, axis=0)
+    # The GUIs' original WAV write: the whole take converted in one go
+    with wave.open(wav_path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 16-bit
+        wf.setframerate(sample_rate)
+        wf.writeframes((audio * 32767).astype(np.int16).tobytes())
+    return whisper.load_audio(wav_path)
+
+
+def buffer_path(clip, sample_rate):
+    buffer = CaptureBuffer(sample_rate)
+    for i in range(0, len(clip), BLOCK):
+        buffer.write(clip[i : i + BLOCK])
+    return to_whisper_rate(buffer.mono(), sample_rate)
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transcribe", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    model = whisper.load_model("base") if args.transcribe else None
+    wav_path = os.path.join(tempfile.mkdtemp(), "bench.wav")
+
+    print(f"{'clip':>6} {'path':>9} {'prepare s':>10} {'total s':>9}")
+    for seconds in DURATIONS:
+        clip_44k = synthetic_clip(seconds, 44100)
+        clip_16k = synthetic_clip(seconds, 16000)
+        paths = {
+            "old": lambda: old_path(clip_44k, 44100, wav_path),
+            "16k": lambda: buffer_path(clip_16k, 16000),
+            "resample": lambda: buffer_path(clip_44k, 44100),
+        }
+        for name, fn in paths.items():
+            prepare, audio = timed(fn, args.repeat)
+            total = prepare
+            if model is not None:
+                start = time.perf_counter()
+                model.transcribe(audio, fp16=False)
+                total += time.perf_counter() - start
+            print(f"{seconds:>5}s {name:>9} {prepare:>10.3f} {total:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
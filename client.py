@@ -1,5 +1,7 @@
 import requests
 import json
+import time
+from sse import parse_events
 
 
 def call_deepseek_api(messages, output_filename="response.txt"):
@@ -32,9 +34,49 @@ def call_deepseek_api(messages, output_filename="response.txt"):
     print(f"Answer saved to '{output_filename}'")
 
 
+def stream_deepseek_api(messages, output_filename="response.txt"):
+    """
+    Like call_deepseek_api, but reads the answer from /ask/stream as it is
+    generated and appends every token to 'output_filename' straight away.
+    """
+    url = "http://localhost:8000/ask/stream"
+    start = time.perf_counter()
+    first_token = None
+
+    with requests.post(url, json={"messages": messages}, stream=True) as response:
+        if response.status_code != 200:
+            print(f"Error: Received status code {response.status_code}")
+            print("Response text:", response.text)
+            return
+
+        # SSE is UTF-8; chunk_size=None hands over each chunk as it arrives
+        response.encoding = "utf-8"
+        lines = response.iter_lines(chunk_size=None, decode_unicode=True)
+        with open(output_filename, "w", encoding="utf-8") as f:
+            for name, data in parse_events(lines):
+                if name == "done":
+                    break
+                if name == "error":
+                    print(f"\nError: {json.loads(data)}")
+                    break
+                token = json.loads(data)
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                f.write(token)
+                f.flush()
+                print(token, end="", flush=True)
+
+    print()
+    if first_token is not None:
+        print(f"First token after {first_token:.2f} s", end=", ")
+    print(
+        f"answer saved to '{output_filename}' after {time.perf_counter() - start:.2f} s"
+    )
+
+
 if __name__ == "__main__":
     # Example usage: ask a question
     messages = [
         {"role": "user", "content": "Who are you?"},
     ]
-    call_deepseek_api(messages, output_filename="deepseek_response.txt")
+    stream_deepseek_api(messages, output_filename="deepseek_response.txt")
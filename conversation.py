@@ -0,0 +1,156 @@
+from collections import deque
+import threading
+
+# Roughly what chat templates add around each message
+MESSAGE_OVERHEAD = 4
+
+
+def approx_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+class ConversationStore:
+    """
+    Turn history for the assistant, trimmed to a token budget.
+
+    Messages are {"role", "content"} dicts, the same shape as the
+    `Message`/`Conversation` models the FastAPI apps accept. Each message's
+    token count is computed once, when it is added, and the store keeps a
+    running total of the messages still in the window, so adding a turn
+    costs O(new messages) however long the conversation gets.
+
+    When the window goes over `max_tokens`, the oldest messages are dropped
+    (a whole turn at a time, so the context never starts with an answer).
+    With a `summarize(summary, messages) -> str` function, dropped messages
+    are folded into a running summary that is sent ahead of the window
+    instead of being forgotten.
+    """
+
+    def __init__(
+        self,
+        max_tokens=2000,
+        system_prompt=None,
+        summarize=None,
+        count_tokens=approx_tokens,
+    ):
+        self.max_tokens = max_tokens
+        self.system_prompt = system_prompt
+        self.summarize = summarize
+        self.count_tokens = count_tokens
+        self.summary = ""
+        self._lock = threading.Lock()
+        self._window = deque()  # (message, tokens), oldest first
+        self._window_tokens = 0
+        self._window_turns = 0  # user messages in the window
+        self._fixed_tokens = self._tokens(self._system_message())
+
+    def add(self, role, content):
+        message = {"role": role, "content": content}
+        with self._lock:
+            self._window.append((message, self._tokens(message)))
+            self._window_tokens += self._window[-1][1]
+            self._window_turns += role == "user"
+            dropped = self._trim()
+        if dropped and self.summarize is not None:
+            self._fold(dropped)
+
+    def add_turn(self, question, answer):
+        self.add("user", question)
+        self.add("assistant", answer)
+
+    def record(self, question, pieces):
+        """
+        Pass a streamed answer through unchanged, and add the turn once the
+        stream has finished. An answer that was cut short isn't remembered.
+        """
+        answer = []
+        for piece in pieces:
+            answer.append(piece)
+            yield piece
+        self.add_turn(question, "".join(answer))
+
+    def context(self):
+        """System prompt, summary and recent turns, within `max_tokens`."""
+        with self._lock:
+            messages = [
+                m for m in (self._system_message(), self._summary_message()) if m
+            ]
+            messages.extend(message for message, _ in self._window)
+            return messages
+
+    @property
+    def tokens(self):
+        """Estimated size of `context()` in tokens."""
+        return self._fixed_tokens + self._window_tokens
+
+    def clear(self):
+        with self._lock:
+            self._window.clear()
+            self._window_tokens = 0
+            self._window_turns = 0
+            self.summary = ""
+            self._fixed_tokens = self._tokens(self._system_message())
+
+    def _system_message(self):
+        if not self.system_prompt:
+            return None
+        return {"role": "system", "content": self.system_prompt}
+
+    def _summary_message(self):
+        if not self.summary:
+            return None
+        content = f"Summary of the conversation so far: {self.summary}"
+        return {"role": "system", "content": content}
+
+    def _tokens(self, message):
+        if not message:
+            return 0
+        return self.count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+    def _trim(self):
+        dropped = []
+        # The latest turn always stays, even if it alone is over budget
+        while self._window_turns > 1 and self.tokens > self.max_tokens:
+            dropped.append(self._pop())
+            # Don't leave an answer without its question at the front
+            while self._window and self._window[0][0]["role"] != "user":
+                dropped.append(self._pop())
+        return dropped
+
+    def _pop(self):
+        message, tokens = self._window.popleft()
+        self._window_tokens -= tokens
+        self._window_turns -= message["role"] == "user"
+        return message
+
+    def _fold(self, dropped):
+        # The longer summary may push more turns out; fold those in as well
+        while dropped:
+            try:
+                summary = self.summarize(self.summary, dropped)
+            except Exception as e:
+                # The answer has been given already: keep the old summary
+                print(f"Could not summarize the conversation: {e}")
+                return
+            with self._lock:
+                self.summary = summary
+                summary_tokens = self._tokens(self._summary_message())
+                self._fixed_tokens = (
+                    self._tokens(self._system_message()) + summary_tokens
+                )
+                dropped = self._trim()
+
+
+def from_config(summarize=None):
+    """Store sized from the `conversation_*` settings, or None if disabled."""
+    from providers import get_config
+
+    settings = get_config()["settings"]
+    if not settings.get("conversation_memory", True):
+        return None
+    return ConversationStore(
+        max_tokens=settings.get("conversation_max_tokens", 2000),
+        system_prompt=settings.get("system_prompt"),
+        summarize=summarize if settings.get("conversation_summarize") else None,
+    )
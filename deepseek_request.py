@@ -1,13 +1,6 @@
-from openai import OpenAI
-import yaml
+from providers import get_deepseek_client
 
-# Load the YAML config
-with open("config.yaml", "r") as file:
-    config = yaml.safe_load(file)
-
-DS_API_TOKEN = config["api_keys"]["deepseek"]
-
-client = OpenAI(api_key=DS_API_TOKEN, base_url="https://api.deepseek.com")
+client = get_deepseek_client()
 
 response = client.chat.completions.create(
     model="deepseek-chat",
@@ -0,0 +1,120 @@
+"""
+Local stand-in for the Hugging Face Inference API, for tests and
+benchmarks. Point `HF_API_URL` at http://127.0.0.1:8003/models/<anything>
+for the text-generation proxies, or `settings.hf_url` at
+http://127.0.0.1:8003 for the InferenceClient chat completions.
+
+Answers with a canned completion after `--latency` seconds, without
+blocking other requests in the meantime. With `"stream": true` the
+completion is sent as Server-Sent Events (TGI or OpenAI format), one word
+every `--token-latency` seconds. Chat answers are `--answer-words` long.
+
+Usage:
+    python fake_hf_server.py [--port 8003] [--latency 0.5] [--token-latency 0.02]
+                             [--answer-words 40]
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+import argparse
+import asyncio
+import json
+import time
+import uvicorn
+
+ANSWER = " This is a canned answer from the fake Hugging Face server."
+SENTENCE = "This is sentence number {} of the canned answer."
+
+app = FastAPI()
+settings = {"latency": 0.5, "token_latency": 0.02, "answer_words": 40}
+
+
+@app.post("/models/{model_id:path}")
+async def text_generation(model_id: str, request: Request):
+    """Accepts the text-generation JSON body ({"inputs": ...})."""
+    body = await request.json()
+    if body.get("stream"):
+        return StreamingResponse(tokens(), media_type="text/event-stream")
+    await asyncio.sleep(settings["latency"])
+    return [{"generated_text": body["inputs"] + ANSWER}]
+
+
+async def tokens():
+    await asyncio.sleep(settings["latency"])
+    for word in ANSWER.split(" ")[1:]:
+        token = {"text": " " + word, "special": False}
+        yield f"data: {json.dumps({'token': token})}\n\n"
+        await asyncio.sleep(settings["token_latency"])
+    token = {"text": "</s>", "special": True}
+    yield f"data: {json.dumps({'token': token, 'generated_text': ANSWER})}\n\n"
+
+
+def chat_answer():
+    """`answer_words` words, in whole sentences so they can be spoken one by one."""
+    words, n = [], 1
+    while len(words) < settings["answer_words"]:
+        words += SENTENCE.format(n).split()
+        n += 1
+    return " ".join(words[: settings["answer_words"]])
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """Accepts the OpenAI chat-completions body; the messages are ignored."""
+    body = await request.json()
+    base = {
+        "id": "fake",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "system_fingerprint": "fake",
+    }
+    if body.get("stream"):
+        return StreamingResponse(chat_chunks(base), media_type="text/event-stream")
+
+    await asyncio.sleep(settings["latency"])
+    answer = chat_answer()
+    return {
+        **base,
+        "object": "chat.completion",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(answer.split())},
+    }
+
+
+async def chat_chunks(base):
+    await asyncio.sleep(settings["latency"])
+    for i, word in enumerate(chat_answer().split()):
+        delta = {"role": "assistant", "content": (" " if i else "") + word}
+        choice = {"index": 0, "delta": delta, "finish_reason": None}
+        chunk = {**base, "object": "chat.completion.chunk", "choices": [choice]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(settings["token_latency"])
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8003)
+    parser.add_argument("--latency", type=float, default=settings["latency"])
+    parser.add_argument(
+        "--token-latency", type=float, default=settings["token_latency"]
+    )
+    parser.add_argument("--answer-words", type=int, default=settings["answer_words"])
+    args = parser.parse_args()
+    settings.update(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        answer_words=args.answer_words,
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
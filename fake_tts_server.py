@@ -0,0 +1,64 @@
+"""
+Local stand-in for the ElevenLabs text-to-speech API, for tests and
+benchmarks. Point `settings.elevenlabs_url` at it.
+
+Answers the convert and stream endpoints with a sine tone as raw 16-bit
+PCM, about `--seconds-per-char` of audio per character of text. The first
+byte is held back by `--latency`, and the rest is sent `--speedup` times
+faster than real time.
+
+Usage:
+    python fake_tts_server.py [--port 8002] [--latency 0.3] [--speedup 4]
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+import argparse
+import asyncio
+import numpy as np
+import uvicorn
+
+CHUNK_SECONDS = 0.1
+
+app = FastAPI()
+settings = {"latency": 0.3, "speedup": 4.0, "seconds_per_char": 0.06}
+
+
+def tone(seconds, rate):
+    t = np.arange(int(seconds * rate)) / rate
+    return (0.2 * 32767 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+
+
+@app.post("/v1/text-to-speech/{voice_id}")
+@app.post("/v1/text-to-speech/{voice_id}/stream")
+async def text_to_speech(voice_id: str, request: Request, output_format: str = ""):
+    """Accepts the ElevenLabs JSON body ({"text": ...}); only pcm_* formats."""
+    body = await request.json()
+    rate = int(output_format[4:]) if output_format.startswith("pcm_") else 24000
+    audio = tone(len(body["text"]) * settings["seconds_per_char"], rate).tobytes()
+    chunk = int(CHUNK_SECONDS * rate) * 2
+
+    async def chunks():
+        await asyncio.sleep(settings["latency"])
+        for start in range(0, len(audio), chunk):
+            yield audio[start : start + chunk]
+            await asyncio.sleep(CHUNK_SECONDS / settings["speedup"])
+
+    return StreamingResponse(chunks(), media_type="audio/pcm")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency", type=float, default=settings["latency"])
+    parser.add_argument("--speedup", type=float, default=settings["speedup"])
+    parser.add_argument(
+        "--seconds-per-char", type=float, default=settings["seconds_per_char"]
+    )
+    args = parser.parse_args()
+    settings.update(
+        latency=args.latency,
+        speedup=args.speedup,
+        seconds_per_char=args.seconds_per_char,
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -1,10 +1,13 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from pydantic import BaseModel
 from typing import List
-import requests
-import json
+import asyncio
 import yaml
-from transformers import pipeline
+from providers import PROXY_CONCURRENCY, new_async_http
+import response_cache
+from sse import sse_response, upstream_tokens
+from tracing import instrument
 
 # Load the YAML config
 with open("config.yaml", "r") as file:
@@ -14,10 +17,40 @@ HF_API_TOKEN = config["api_keys"]["huggingface"]
 # HF_API_URL = "https://api-inference.huggingface.co/models/deepseek-ai/DeepSeek-R1"
 # HF_API_URL = "https://api-inference.huggingface.co/models/meta-llama/Llama-3.1-8B-Instruct"
 HF_API_URL = "https://api-inference.huggingface.co/models/deepseek-ai/DeepSeek-V3"
+GENERATION_PARAMETERS = {
+    "max_new_tokens": 128,
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "do_sample": True,
+}
+# ------------------------------
+# Shared upstream client
+# ------------------------------
+# One pooled AsyncClient for every request; the semaphore caps how many
+# upstream calls are in flight, the rest wait their turn instead of failing
+# on an exhausted pool.
+http_client = None
+upstream_slots = asyncio.Semaphore(
+    config["settings"].get("proxy_concurrency", PROXY_CONCURRENCY)
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global http_client
+    http_client = new_async_http()
+    yield
+    await http_client.aclose()
+
+
 # ------------------------------
 # FastAPI App
 # ------------------------------
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+tracer = instrument(app)  # request spans and GET /metrics
+
+# Repeated prompts are answered from here without calling the model
+cache = response_cache.from_config()
 
 
 # ------------------------------
@@ -35,22 +68,13 @@ class Conversation(BaseModel):
 # ------------------------------
 # Helper Function to Call the HF API
 # ------------------------------
-def query_huggingface_api(prompt: str):
-    headers = {
-        "Authorization": f"Bearer {HF_API_TOKEN}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "inputs": prompt,
-        "parameters": {
-            "max_new_tokens": 128,
-            "temperature": 0.7,
-            "top_p": 0.9,
-            "do_sample": True,
-        },
-    }
-
-    response = requests.post(HF_API_URL, headers=headers, data=json.dumps(payload))
+@response_cache.cached_answer(cache)
+async def query_huggingface_api(prompt: str):
+    headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
+    payload = {"inputs": prompt, "parameters": GENERATION_PARAMETERS}
+
+    async with upstream_slots:
+        response = await http_client.post(HF_API_URL, headers=headers, json=payload)
 
     if response.status_code != 200:
         raise ValueError(f"Error {response.status_code}: {response.text}")
@@ -59,18 +83,38 @@ def query_huggingface_api(prompt: str):
     return result
 
 
+@response_cache.cached_stream(cache)
+async def stream_huggingface_api(prompt: str):
+    """
+    Like query_huggingface_api, but yields the answer token by token as the
+    upstream generates it.
+    """
+    headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
+    payload = {"inputs": prompt, "parameters": GENERATION_PARAMETERS, "stream": True}
+
+    async with upstream_slots:
+        async with http_client.stream(
+            "POST", HF_API_URL, headers=headers, json=payload
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise ValueError(f"Error {response.status_code}: {response.text}")
+            async for token in upstream_tokens(response):
+                yield token
+
+
 # ------------------------------
 # Endpoint to Accept Messages
 # ------------------------------
 
 
 @app.post("/ask")
-def ask_question(conversation: Conversation):
+async def ask_question(conversation: Conversation):
     # Correct access to object attributes
     prompt = "\n".join([f"{msg.role}: {msg.content}" for msg in conversation.messages])
 
     # Call the hosted HF model
-    output = query_huggingface_api(prompt)
+    output = await query_huggingface_api(prompt)
 
     # Extract the generated text (adjust parsing if needed)
     try:
@@ -81,6 +125,22 @@ def ask_question(conversation: Conversation):
     return {"answer": generated_text}
 
 
+@app.post("/ask/stream")
+async def ask_question_stream(conversation: Conversation):
+    """Same input as /ask; the answer comes back as Server-Sent Events."""
+    prompt = "\n".join([f"{msg.role}: {msg.content}" for msg in conversation.messages])
+    return sse_response(stream_huggingface_api(prompt))
+
+
+# ------------------------------
+# Response cache statistics
+# ------------------------------
+@app.get("/cache")
+def cache_stats():
+    """Hit rate and latency saved by the response cache."""
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
 # ------------------------------
 # Start the FastAPI Server
 # ------------------------------
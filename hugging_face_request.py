@@ -1,10 +1,13 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from pydantic import BaseModel
-import requests
-import json
+import asyncio
 import uvicorn
 import yaml
-from transformers import pipeline
+from providers import PROXY_CONCURRENCY, new_async_http
+import response_cache
+from sse import sse_response, upstream_tokens
+from tracing import instrument
 
 # Load the YAML config
 with open("config.yaml", "r") as file:
@@ -19,10 +22,41 @@ HF_API_TOKEN = config["api_keys"]["huggingface"]
 # or your own private endpoint if you're hosting a Space or a custom Inference Endpoint.
 HF_API_URL = "https://api-inference.huggingface.co/models/REPLACE_ME_WITH_LLAMA_MODEL"
 
+GENERATION_PARAMETERS = {
+    "max_new_tokens": 128,
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "do_sample": True,
+}
+
+# ------------------------------
+# Shared upstream client
+# ------------------------------
+# One pooled AsyncClient for every request; the semaphore caps how many
+# upstream calls are in flight, the rest wait their turn instead of failing
+# on an exhausted pool.
+http_client = None
+upstream_slots = asyncio.Semaphore(
+    config["settings"].get("proxy_concurrency", PROXY_CONCURRENCY)
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global http_client
+    http_client = new_async_http()
+    yield
+    await http_client.aclose()
+
+
 # ------------------------------
 # FastAPI application
 # ------------------------------
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+tracer = instrument(app)  # request spans and GET /metrics
+
+# Repeated prompts are answered from here without calling the model
+cache = response_cache.from_config()
 
 
 # ------------------------------
@@ -35,28 +69,19 @@ class Question(BaseModel):
 # ------------------------------
 # Helper function to call the HF Inference API
 # ------------------------------
-def query_huggingface_api(prompt: str):
+@response_cache.cached_answer(cache)
+async def query_huggingface_api(prompt: str):
     """
     Calls the Hugging Face Inference API for a given prompt.
     """
-    headers = {
-        "Authorization": f"Bearer {HF_API_TOKEN}",
-        "Content-Type": "application/json",
-    }
+    headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
     # You can adjust parameters depending on model.
     # e.g., for conversation models that expect {"inputs": {"text": "..."}}
     # or for text-generation models that expect {"inputs": "..."}
-    payload = {
-        "inputs": prompt,
-        "parameters": {
-            "max_new_tokens": 128,
-            "temperature": 0.7,
-            "top_p": 0.9,
-            "do_sample": True,
-        },
-    }
-
-    response = requests.post(HF_API_URL, headers=headers, data=json.dumps(payload))
+    payload = {"inputs": prompt, "parameters": GENERATION_PARAMETERS}
+
+    async with upstream_slots:
+        response = await http_client.post(HF_API_URL, headers=headers, json=payload)
     if response.status_code != 200:
         raise ValueError(
             f"Hugging Face API error {response.status_code}: {response.text}"
@@ -69,11 +94,33 @@ def query_huggingface_api(prompt: str):
     return result
 
 
+@response_cache.cached_stream(cache)
+async def stream_huggingface_api(prompt: str):
+    """
+    Like query_huggingface_api, but yields the answer token by token as the
+    upstream generates it.
+    """
+    headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
+    payload = {"inputs": prompt, "parameters": GENERATION_PARAMETERS, "stream": True}
+
+    async with upstream_slots:
+        async with http_client.stream(
+            "POST", HF_API_URL, headers=headers, json=payload
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise ValueError(
+                    f"Hugging Face API error {response.status_code}: {response.text}"
+                )
+            async for token in upstream_tokens(response):
+                yield token
+
+
 # ------------------------------
 # API endpoint: POST /ask
 # ------------------------------
 @app.post("/ask")
-def ask_question(payload: Question):
+async def ask_question(payload: Question):
     """
     Accepts a JSON body like:
         {
@@ -89,7 +136,7 @@ def ask_question(payload: Question):
     prompt = f"Question: {question_text}\nAnswer:"
 
     # Query the Hugging Face Inference API
-    output = query_huggingface_api(prompt)
+    output = await query_huggingface_api(prompt)
 
     # You may need to adjust how you extract the answer
     # depending on the model's return format.
@@ -103,6 +150,28 @@ def ask_question(payload: Question):
     return {"answer": generated_text}
 
 
+# ------------------------------
+# API endpoint: POST /ask/stream
+# ------------------------------
+@app.post("/ask/stream")
+async def ask_question_stream(payload: Question):
+    """
+    Same body as /ask. The answer is sent as Server-Sent Events, one
+    `data:` event per token, then `event: done`.
+    """
+    prompt = f"Question: {payload.question}\nAnswer:"
+    return sse_response(stream_huggingface_api(prompt))
+
+
+# ------------------------------
+# Response cache statistics
+# ------------------------------
+@app.get("/cache")
+def cache_stats():
+    """Hit rate and latency saved by the response cache."""
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
 # ------------------------------
 # Run the server
 # ------------------------------
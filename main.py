@@ -1,12 +1,6 @@
-from elevenlabs.client import ElevenLabs
-from elevenlabs import play
 import yaml
-from importlib import reload
-import player
 import recorder_gui
 
-reload(player)
-
 # Load the YAML config
 with open("config.yaml", "r") as file:
     config = yaml.safe_load(file)
@@ -25,6 +19,9 @@ if __name__ == "__main__":
     print("Starting the recorder GUI...")
     recorder_gui.main()
 
+    # Imported only now so the TTS client doesn't delay the window
+    import player
+
     # produce the transcription
     with open("transcriptions/transcription.txt", "r") as file:
         t = file.read()
@@ -1,7 +1,9 @@
-from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
 from elevenlabs import play
 import yaml
+from providers import get_elevenlabs_client
+from sentence_stream import background_iter
+from tracing import get_tracer
+from tts_cache import AudioCache
 
 # Load the YAML config
 with open("config.yaml", "r") as file:
@@ -13,18 +15,143 @@ ELEVENLABS_API_KEY = config["api_keys"]["elevenlabs"]
 MODEL = config["settings"]["model"]
 LANGUAGE = config["settings"]["language"]
 VOICE = config["settings"]["voice"]
+STREAM_TTS = config["settings"].get("stream_tts", True)
+TTS_CACHE_MB = config["settings"].get("tts_cache_mb", 200)
 
+# --- Settings ---
+VOICE_ID = "gfKKsLN1k0oYYN9n2dXX"  # violetta
+# VOICE_ID = "JBFqnCBsd6RMkjVDRZzb"
+MODEL_ID = "eleven_multilingual_v2"
+MP3_FORMAT = "mp3_44100_128"
+PCM_RATE = 24000  # raw 16-bit mono, so no MP3 decoder sits in the loop
+PCM_FORMAT = f"pcm_{PCM_RATE}"
+PCM_CHUNK = PCM_RATE // 10 * 2  # bytes per chunk when replaying from cache
+PREFETCH_CHUNKS = 64
+TTS_CACHE_DIR = "transcriptions/tts_cache"
 
-def play_text(t: str):
-    load_dotenv()
-    client = ElevenLabs(
-        api_key=ELEVENLABS_API_KEY,
+# Repeated phrases are played from here instead of being synthesised again
+cache = AudioCache(TTS_CACHE_DIR, int(TTS_CACHE_MB * 2**20)) if TTS_CACHE_MB else None
+
+
+def synthesize(t: str):
+    """Fetch the speech for `t` from ElevenLabs (or the cache) as MP3 bytes."""
+    if cache is not None:
+        key = AudioCache.key(t, VOICE_ID, MODEL_ID, MP3_FORMAT)
+        audio = cache.get(key)
+        if audio is not None:
+            return audio
+
+    audio = get_elevenlabs_client().text_to_speech.convert(
+        text=t,
+        voice_id=VOICE_ID,
+        model_id=MODEL_ID,
+        output_format=MP3_FORMAT,
     )
-    audio = client.text_to_speech.convert(
+    audio = b"".join(audio)
+    if cache is not None:
+        cache.put(key, audio)
+    return audio
+
+
+def stream_pcm(t: str):
+    """Yield raw PCM chunks for `t` as ElevenLabs (or the cache) streams them back."""
+    if cache is not None:
+        key = AudioCache.key(t, VOICE_ID, MODEL_ID, PCM_FORMAT)
+        audio = cache.get(key)
+        if audio is not None:
+            for start in range(0, len(audio), PCM_CHUNK):
+                yield audio[start : start + PCM_CHUNK]
+            return
+
+    tts = get_elevenlabs_client().text_to_speech
+    # Newer SDKs call the streaming endpoint `stream`
+    stream = getattr(tts, "stream", None) or tts.convert_as_stream
+    received = []
+    for chunk in stream(
         text=t,
-        # voice_id="JBFqnCBsd6RMkjVDRZzb",
-        voice_id="gfKKsLN1k0oYYN9n2dXX",  # violetta
-        model_id="eleven_multilingual_v2",
-        output_format="mp3_44100_128",
+        voice_id=VOICE_ID,
+        model_id=MODEL_ID,
+        output_format=PCM_FORMAT,
+    ):
+        received.append(chunk)
+        yield chunk
+
+    # Only reached when the whole clip came through, never for a cut-off one
+    if cache is not None:
+        cache.put(key, b"".join(received))
+
+
+def play_text(t: str, trace=None):
+    if STREAM_TTS:
+        play_sentences([t], trace=trace)
+    else:
+        play(traced_synthesize(t, trace))
+
+
+def traced_synthesize(t: str, trace=None):
+    with get_tracer().span("tts", trace=trace, chars=len(t)) as span:
+        audio = synthesize(t)
+        span.set(bytes=len(audio))
+    return audio
+
+
+def traced_stream_pcm(t: str, trace=None):
+    # Time to the first chunk is the synthesis latency; the span's duration
+    # also includes waiting for earlier audio to play
+    return get_tracer().traced(
+        "tts", stream_pcm(t), trace=trace, size=len, unit="bytes", chars=len(t)
     )
-    play(audio)
+
+
+def play_sentences(sentences, cancelled=None, on_first_audio=None, trace=None):
+    """
+    Speak sentences as they arrive. Audio for the next sentence is fetched
+    while the current one plays; with `stream_tts` the PCM chunks go to a
+    single output stream as soon as they land, otherwise each sentence is
+    fetched as a whole MP3 and played with `elevenlabs.play`.
+    `on_first_audio` is called right before the first sound; playback
+    stops once the `cancelled` event is set. `trace` tags the tts spans.
+    """
+    if STREAM_TTS:
+        pieces = (chunk for s in sentences for chunk in traced_stream_pcm(s, trace))
+        pieces = background_iter(pieces, cancelled, maxsize=PREFETCH_CHUNKS)
+        play_pcm(pieces, on_first_audio)
+    else:
+        audio = (traced_synthesize(s, trace) for s in sentences)
+        pieces = background_iter(audio, cancelled, maxsize=2)
+        for audio in pieces:
+            if on_first_audio is not None:
+                on_first_audio()
+                on_first_audio = None
+            play(audio)
+
+    if cache is not None:
+        print(f"TTS cache: {cache.hits} hits, {cache.misses} misses")
+
+
+def open_output():
+    """
+    The stream `play_pcm` writes to: the sound card. bench_turn.py swaps
+    this for a null sink to run turns without speakers.
+    """
+    import sounddevice as sd
+
+    return sd.RawOutputStream(samplerate=PCM_RATE, channels=1, dtype="int16")
+
+
+def play_pcm(chunks, on_first_audio=None):
+    """Write 16-bit mono PCM chunks to the sound card as they come in."""
+    leftover = b""
+    # Leaving the block waits for the queued audio to finish playing
+    with open_output() as out:
+        for chunk in chunks:
+            data = leftover + chunk
+            # Chunks can split a sample in half; keep the odd byte for later
+            n = len(data) - len(data) % 2
+            leftover = data[n:]
+            if not n:
+                continue
+            if on_first_audio is not None:
+                on_first_audio()
+                on_first_audio = None
+            out.write(data[:n])
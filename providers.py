@@ -0,0 +1,180 @@
+"""
+Long-lived clients for the remote services, shared by every turn.
+
+Building a client per call means re-reading config.yaml and paying a new
+TCP + TLS handshake each time. Here each backend gets one client, created
+on first use, whose connection pool is kept alive between turns.
+`prewarm` opens those connections ahead of time, e.g. while the user is
+still recording.
+
+The Hugging Face client, on its router or `settings.hf_url`, is the exception:
+huggingface_hub keeps one session per thread and every turn streams from
+a new thread, so its connections can be neither shared nor prewarmed.
+"""
+
+from functools import lru_cache
+import importlib.util
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import yaml
+
+# --- Settings ---
+POOL_SIZE = 10
+KEEPALIVE_SECONDS = 60
+PREWARM_TIMEOUT = 3
+ELEVENLABS_URL = "https://api.elevenlabs.io"
+DEEPSEEK_URL = "https://api.deepseek.com"
+# Upstream limits for the async FastAPI proxies (hugging_face_api / _request)
+PROXY_POOL_SIZE = 100
+PROXY_TIMEOUT = 60
+PROXY_CONCURRENCY = 64
+# httpx only speaks HTTP/2 when the optional `h2` package is installed
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+_lock = threading.Lock()
+_last_prewarm = 0.0
+
+
+@lru_cache(maxsize=None)
+def get_config(path="config.yaml"):
+    """The parsed YAML config, read once per process."""
+    with open(path, "r") as file:
+        return yaml.safe_load(file)
+
+
+@lru_cache(maxsize=None)
+def get_http_session():
+    """A requests session with a keep-alive pool, for plain HTTP calls."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@lru_cache(maxsize=None)
+def get_hf_client():
+    """
+    Shared Hugging Face InferenceClient. Its HTTP sessions are the hub's
+    own (HTTP/1.1, one per thread in older versions): the hub's backend is
+    process-wide, so it is left alone rather than pointed at ours.
+    """
+    from huggingface_hub import InferenceClient
+
+    # An OpenAI-compatible server of our own, e.g. fake_hf_server.py
+    hf_url = get_config()["settings"].get("hf_url")
+    if hf_url:
+        return InferenceClient(
+            base_url=hf_url, api_key=get_config()["api_keys"]["huggingface"]
+        )
+
+    return InferenceClient(
+        # provider="hyperbolic",
+        provider="hf-inference",
+        api_key=get_config()["api_keys"]["huggingface"],
+    )
+
+
+def new_http():
+    """A pooled httpx.Client (HTTP/2 when available) to share between threads."""
+    import httpx
+
+    return httpx.Client(
+        http2=HTTP2,
+        timeout=httpx.Timeout(60, connect=10),
+        limits=httpx.Limits(
+            max_connections=POOL_SIZE, keepalive_expiry=KEEPALIVE_SECONDS
+        ),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_elevenlabs_http():
+    return new_http()
+
+
+@lru_cache(maxsize=None)
+def get_deepseek_http():
+    return new_http()
+
+
+def new_async_http():
+    """
+    An httpx.AsyncClient for the FastAPI proxies, sized by the `proxy_*`
+    settings. It belongs to the event loop that uses it, so each app
+    creates its own at startup and closes it on shutdown.
+    """
+    import httpx
+
+    settings = get_config()["settings"]
+    pool = settings.get("proxy_pool_size", PROXY_POOL_SIZE)
+    return httpx.AsyncClient(
+        http2=HTTP2,
+        timeout=httpx.Timeout(settings.get("proxy_timeout", PROXY_TIMEOUT), connect=10),
+        limits=httpx.Limits(
+            max_connections=pool,
+            max_keepalive_connections=pool,
+            keepalive_expiry=KEEPALIVE_SECONDS,
+        ),
+    )
+
+
+def elevenlabs_url():
+    return get_config()["settings"].get("elevenlabs_url") or ELEVENLABS_URL
+
+
+@lru_cache(maxsize=None)
+def get_elevenlabs_client():
+    """Shared ElevenLabs client on a pooled (HTTP/2 when available) connection."""
+    from elevenlabs.client import ElevenLabs
+
+    return ElevenLabs(
+        api_key=get_config()["api_keys"]["elevenlabs"],
+        base_url=elevenlabs_url(),
+        httpx_client=get_elevenlabs_http(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_deepseek_client():
+    """Shared OpenAI-compatible client for the DeepSeek API, on a pooled connection."""
+    from openai import OpenAI
+
+    return OpenAI(
+        api_key=get_config()["api_keys"]["deepseek"],
+        base_url=DEEPSEEK_URL,
+        http_client=get_deepseek_http(),
+    )
+
+
+def prewarm():
+    """
+    Open connections to ElevenLabs and the LLM providers in
+    `settings.llm_providers` that have a shared pool (DeepSeek, our own
+    /ask/stream servers) on a background thread, so the next turn doesn't
+    pay for the handshakes. Cheap to call often: it does nothing while the
+    pools should still be warm.
+    """
+    global _last_prewarm
+    with _lock:
+        if time.monotonic() - _last_prewarm < KEEPALIVE_SECONDS / 2:
+            return
+        _last_prewarm = time.monotonic()
+    threading.Thread(target=_prewarm, daemon=True).start()
+
+
+def _prewarm():
+    targets = [(get_elevenlabs_http().head, elevenlabs_url())]
+    for name in get_config()["settings"].get("llm_providers") or []:
+        if name == "deepseek":
+            targets.append((get_deepseek_http().head, DEEPSEEK_URL))
+        elif name.startswith(("http://", "https://")):
+            # The session router.stream_from_server posts with
+            targets.append((get_http_session().head, name))
+    for head, url in targets:
+        try:
+            head(url, timeout=PREWARM_TIMEOUT)
+        except Exception as e:
+            print(f"Could not prewarm {url}: {e}")
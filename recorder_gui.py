@@ -1,12 +1,8 @@
 import tkinter as tk
 import threading
-import sounddevice as sd
-import numpy as np
-import wave
-import whisper
-import os
+import time
 import yaml
-import player
+from turn_executor import TurnExecutor
 
 # Load the YAML config
 with open("config.yaml", "r") as file:
@@ -18,107 +14,362 @@ ELEVENLABS_API_KEY = config["api_keys"]["elevenlabs"]
 MODEL = config["settings"]["model"]
 LANGUAGE = config["settings"]["language"]
 VOICE = config["settings"]["voice"]
+STREAMING = config["settings"].get("streaming", True)
+ARCHIVE_WAV = config["settings"].get("archive_wav", True)
+TRANSCRIPTION_SERVER = config["settings"].get("transcription_server")
+VAD = config["settings"].get("vad", True)
+VAD_SILENCE_SECONDS = config["settings"].get("vad_silence_seconds", 1.0)
+VAD_THRESHOLD_DB = config["settings"].get("vad_threshold_db", -45.0)
 
 # --- Settings ---
-SAMPLE_RATE = 44100
+# Whisper works at 16 kHz, so capturing at that rate skips resampling
+SAMPLE_RATE = config["settings"].get("sample_rate", 16000)
 CHANNELS = 1
-MODEL = whisper.load_model("base")
+STOP_TIMEOUT = 2.0  # seconds to wait for the recorder to flush
+ENDPOINT_POLL_MS = 100
 
 # --- File paths ---
 OUTPUT_WAV = "transcriptions/voce.wav"
 TRANSCRIPTION_FILE = "transcriptions/transcription.txt"
 
+# --- Loaded in the background by load_backends ---
+sd = None
+player = None
+tracer = None  # per-stage spans, see tracing.py
+audio_data = None
+capture_ready = threading.Event()
+backends_ready = threading.Event()
+backends_error = None  # why loading failed, raised again by every turn
+
 # --- Global State ---
 recording = False
-audio_data = []
+record_started = 0.0
+streamer = None
+vad = None
+record_thread = None
+stop_event = threading.Event()
+stop_latencies = []  # stop-to-ready time of each take, in seconds
+executor = None  # TurnExecutor, created with the window
+
+
+def load_backends():
+    """
+    Import the heavy modules and load the Whisper model. Runs on a
+    background thread so the window shows straight away: recording can
+    start once `capture_ready` is set, the rest is only needed after it.
+    """
+    global sd, CaptureBuffer, EnergyVAD, backends_error
+    try:
+        import sounddevice as sd
+        from audio_buffer import CaptureBuffer
+        from vad import EnergyVAD
+
+        capture_ready.set()
+        load_pipeline()
+    except Exception as e:
+        # Fail the turns with it rather than have them wait forever
+        print(f"Loading the backends failed: {e}")
+        backends_error = e
+        backends_ready.set()
+        return
+    prewarm()
+
+
+def load_pipeline():
+    """Load what a turn needs once the take is recorded."""
+    global write_wav, to_whisper_rate
+    global StreamingTranscriber, player, MODEL, prewarm, tracer
+    from audio_buffer import write_wav
+    from resample import to_whisper_rate
+    from streaming import StreamingTranscriber
+    from stt_client import LockedModel, RemoteWhisperModel
+    import player
+    from providers import prewarm
+    from tracing import get_tracer
+
+    tracer = get_tracer()
+
+    # Use the warm model in transcription_server.py when it is running
+    model = RemoteWhisperModel(TRANSCRIPTION_SERVER) if TRANSCRIPTION_SERVER else None
+    if model is None or not model.is_available():
+        print("No transcription server, loading Whisper locally.")
+        from stt_backends import load_from_config
+
+        # Streaming and the executor may transcribe from two threads at once
+        model = LockedModel(load_from_config())
+    MODEL = model
+    backends_ready.set()
+
+
+def backends_loaded():
+    """Whether the model and clients are there to use, now rather than later."""
+    return backends_ready.is_set() and backends_error is None
+
+
+def enable_when_ready(root, status_label, buttons):
+    """Poll from the Tk loop until capture is ready, then allow recording."""
+    if not capture_ready.is_set():
+        if backends_error is not None:
+            # Nothing to record with, so the buttons stay disabled
+            status_label.config(text=f"Status: Loading failed: {backends_error}")
+            return
+        root.after(50, enable_when_ready, root, status_label, buttons)
+        return
+    for button in buttons:
+        button.config(state="normal")
+    status_label.config(text="Status: Ready")
 
 
 def record_audio():
-    """Continuously reads audio while `recording` is True."""
-    global recording, audio_data
-    audio_data = []
+    """Continuously reads audio until `stop_event` is set."""
 
     def callback(indata, frames, time, status):
-        if recording:
-            audio_data.append(indata.copy())
-
-    # Open a recording stream and keep it active until recording = False
+        audio_data.write(indata)
+        if vad is not None:
+            vad.process(indata[:, 0])
+        if streamer is not None:
+            streamer.wake()
+
+    # Leaving the block stops the stream, which only returns once the
+    # pending buffers have gone through the callback
     with sd.InputStream(
         samplerate=SAMPLE_RATE, channels=CHANNELS, dtype="float32", callback=callback
     ):
-        while recording:
-            sd.sleep(100)
-
-
-def start_recording(status_label):
-    """Start the recording in a background thread."""
-    global recording
+        stop_event.wait()
+
+
+def wait_for_recorder():
+    """
+    Signal the recorder thread to stop and wait until it has flushed.
+    Returns how long that took, in seconds.
+    """
+    started = time.perf_counter()
+    stop_event.set()
+    record_thread.join(timeout=STOP_TIMEOUT)
+    if record_thread.is_alive():
+        print(f"Recorder did not stop within {STOP_TIMEOUT}s, using what we have.")
+
+    stop_latencies.append(time.perf_counter() - started)
+    print(f"Stop-to-ready: {stop_latencies[-1] * 1000:.0f} ms")
+    return stop_latencies[-1]
+
+
+def start_recording(status_label, on_endpoint=None):
+    """
+    Start the recording in a background thread. With VAD enabled,
+    `on_endpoint` is called from the Tk loop once the user stops talking.
+    """
+    global recording, audio_data, streamer, vad, record_thread, record_started
     if recording:
         return  # Already recording
 
+    # A fresh buffer per take: earlier takes may still be in the executor
+    audio_data = CaptureBuffer(SAMPLE_RATE, CHANNELS)
+    vad = None
+    if VAD:
+        vad = EnergyVAD(
+            SAMPLE_RATE,
+            threshold_db=VAD_THRESHOLD_DB,
+            silence_seconds=VAD_SILENCE_SECONDS,
+        )
+    if STREAMING and backends_loaded():
+        # Transcribe in the background while the user is still speaking
+        streamer = StreamingTranscriber(
+            MODEL,
+            SAMPLE_RATE,
+            buffer=audio_data,
+            on_partial=print_partial,
+        ).start()
+
+    if backends_loaded():
+        # Open the provider connections while the user is still talking
+        prewarm()
+
     recording = True
+    record_started = time.perf_counter()
     status_label.config(text="Status: Recording...")
-    threading.Thread(target=record_audio, daemon=True).start()
+    stop_event.clear()
+    record_thread = threading.Thread(target=record_audio, daemon=True)
+    record_thread.start()
+
+    if vad is not None and on_endpoint is not None:
+        status_label.after(
+            ENDPOINT_POLL_MS, watch_for_endpoint, status_label, on_endpoint, vad
+        )
 
 
 def stop_recording(status_label):
-    """Stop the recording, save the WAV file, and transcribe."""
-    global recording
+    """Stop the recording and hand the take over to the turn executor."""
+    global recording, streamer
     if not recording:
         return  # Not currently recording
 
     recording = False
-    status_label.config(text="Status: Saving & Transcribing...")
+    status_label.config(text="Status: Stopping...")
+    stopped = wait_for_recorder()
 
-    # Wait a moment for the recording thread to fully stop
-    # Typically you might do something more robust than just a short sleep
-    sd.sleep(500)
+    recorded = time.perf_counter() - record_started
+    # The take carries its own timings: by the time it is transcribed,
+    # newer takes may have been stopped
+    executor.submit((audio_data, vad, streamer, recorded, stopped))
+    streamer = None
 
-    save_recording()
-    transcribe_audio()
 
-    # TODO get answer
-
-    # Read it
-    with open("transcriptions/transcription.txt", "r") as file:
-        t = file.read()
-    player.play_text(t=t)
-
-    status_label.config(text="Status: Ready")
-
-
-def save_recording():
-    """Save the audio_data to a WAV file."""
-    if not audio_data:
+def show_progress(status_label, turn, label):
+    """Report a turn's progress on the status label (runs on the Tk thread)."""
+    if recording:
+        return  # the label is showing the take being recorded
+    if label == "Done":
+        timings = ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in turn.marks.items())
+        print(f"Turn {turn.number}: {timings}")
+        tracer.add("turn", turn.marks["total"], trace=turn.number)
+    if label in ("Done", "Cancelled"):
+        if executor.busy:
+            return  # another turn is still going and will report itself
+        label = "Ready"
+    status_label.config(text=f"Status: {label}")
+
+
+def cancel_turns(status_label):
+    """Cancel every turn that is still being transcribed, answered or spoken."""
+    executor.cancel_all()
+    if not recording:
+        status_label.config(text="Status: Cancelling...")
+
+
+def watch_for_endpoint(status_label, on_endpoint, take_vad):
+    """Poll from the Tk loop until the VAD hears the end of the utterance."""
+    if not recording or vad is not take_vad:
+        return  # stopped by hand, or a newer take is running
+    if take_vad.endpointed:
+        print("End of utterance detected.")
+        on_endpoint()
+    else:
+        status_label.after(
+            ENDPOINT_POLL_MS, watch_for_endpoint, status_label, on_endpoint, take_vad
+        )
+
+
+def speech_audio(buffer, take_vad):
+    """Recorded samples with leading and trailing silence trimmed off."""
+    audio = buffer.mono()
+    bounds = take_vad.speech_bounds(len(audio)) if take_vad is not None else None
+    if bounds is None:
+        return audio  # no speech found: better to let Whisper hear it all
+    return audio[bounds[0] : bounds[1]]
+
+
+def save_recording(buffer, trace=None):
+    """Archive a take to a WAV file on a background thread."""
+    if not buffer:
         print("No audio recorded.")
         return
 
-    audio = np.concatenate(audio_data, axis=0)
-    with wave.open(OUTPUT_WAV, "wb") as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(2)  # 16-bit
-        wf.setframerate(SAMPLE_RATE)
-        wf.writeframes((audio * 32767).astype(np.int16).tobytes())
+    if ARCHIVE_WAV:
 
-    print(f"Audio saved to {OUTPUT_WAV}")
+        def archive():
+            with tracer.span("wav_write", trace=trace, bytes=len(buffer) * 2):
+                write_wav(OUTPUT_WAV, buffer.view(), SAMPLE_RATE)
+            print(f"Audio saved to {OUTPUT_WAV}")
 
+        threading.Thread(target=archive, daemon=True).start()
 
-def transcribe_audio():
-    """Use Whisper to transcribe the saved audio and write to a text file."""
-    if not os.path.exists(OUTPUT_WAV):
-        print("No WAV file found to transcribe.")
-        return
+    print(
+        f"Capture buffer: {buffer.nbytes} bytes held, "
+        f"high-water mark {buffer.high_water} bytes"
+    )
+
+
+def transcribe_audio(buffer, take_vad):
+    """Use Whisper to transcribe a take, write it to a text file and return it."""
+    if not buffer:
+        print("No audio recorded to transcribe.")
+        return ""
 
     print("Transcribing...")
-    result = MODEL.transcribe(OUTPUT_WAV)
+    # Hand Whisper the samples directly instead of round-tripping through ffmpeg.
+    # Only the text is needed, so a batching transcription server may batch it.
+    result = MODEL.transcribe(
+        to_whisper_rate(speech_audio(buffer, take_vad), SAMPLE_RATE),
+        without_timestamps=True,
+    )
     with open(TRANSCRIPTION_FILE, "w", encoding="utf-8") as f:
         f.write(result["text"])
     print(f"Transcription saved to {TRANSCRIPTION_FILE}")
     print(f"Transcription Text: {result['text']}")
+    return result["text"]
 
 
-def main():
-    """Create the GUI and run the Tkinter main event loop."""
+def finish_streaming_transcription(take_streamer, buffer, take_vad):
+    """Transcribe the remaining tail of a streamed take, save and return it."""
+    bounds = take_vad.speech_bounds(len(buffer)) if take_vad is not None else None
+    text = take_streamer.finish(end=bounds[1] if bounds else None)
+    with open(TRANSCRIPTION_FILE, "w", encoding="utf-8") as f:
+        f.write(text)
+    print(f"Transcription saved to {TRANSCRIPTION_FILE}")
+    print(f"Transcription Text: {text}")
+    return text
+
+
+def transcribe_stage(turn, take):
+    """Turn stage: archive the take and turn it into text."""
+    buffer, take_vad, take_streamer, recorded, stopped = take
+    backends_ready.wait()  # a take can end before the model has loaded
+    if backends_error is not None:
+        raise backends_error
+    tracer.add(
+        "record",
+        recorded,
+        trace=turn.number,
+        audio_seconds=len(buffer) / SAMPLE_RATE,
+        stop_ms=stopped * 1000,
+    )
+    save_recording(buffer, trace=turn.number)
+    try:
+        with tracer.span(
+            "stt",
+            trace=turn.number,
+            audio_seconds=len(buffer) / SAMPLE_RATE,
+            streaming=take_streamer is not None,
+        ) as span:
+            if take_streamer is not None:
+                text = finish_streaming_transcription(take_streamer, buffer, take_vad)
+            else:
+                text = transcribe_audio(buffer, take_vad)
+            span.set(chars=len(text))
+    except BaseException:
+        drop_take(take)
+        raise
+    return text
+
+
+def drop_take(take):
+    """Stop the streaming transcriber of a take that will not be transcribed."""
+    take_streamer = take[2]
+    if take_streamer is not None:
+        take_streamer.stop()
+
+
+def print_partial(text):
+    """on_partial callback for the streaming transcriber of a take."""
+    print(f"Partial: {text}")
+
+
+def speak_stage(turn, text):
+    """Turn stage: read the transcription back."""
+    player.play_text(t=text, trace=turn.number)
+
+
+# A cancelled turn's take is dropped before it is transcribed
+TURN_STAGES = [
+    ("Transcribing...", transcribe_stage, drop_take),
+    ("Speaking...", speak_stage),
+]
+
+
+def build_window():
+    """Create the window and start loading the backends behind it."""
+    global executor
     # Create the main window
     root = tk.Tk()
     root.title("Audio Recorder")
@@ -128,12 +379,16 @@ def main():
     frame.pack()
 
     # Label to show status
-    status_label = tk.Label(frame, text="Status: Ready")
+    status_label = tk.Label(frame, text="Status: Loading...")
     status_label.pack(pady=5)
 
     # Registre button
     start_button = tk.Button(
-        frame, text="Registra", command=lambda: start_recording(status_label)
+        frame,
+        text="Registra",
+        command=lambda: start_recording(
+            status_label, on_endpoint=lambda: stop_recording(status_label)
+        ),
     )
     start_button.pack(pady=5, fill="x")
 
@@ -143,6 +398,30 @@ def main():
     )
     stop_button.pack(pady=5, fill="x")
 
+    # Cancel button
+    cancel_button = tk.Button(
+        frame, text="Annulla", command=lambda: cancel_turns(status_label)
+    )
+    cancel_button.pack(pady=5, fill="x")
+
+    # Turns run on worker threads so the window keeps repainting
+    executor = TurnExecutor(
+        root,
+        TURN_STAGES,
+        on_progress=lambda turn, label: show_progress(status_label, turn, label),
+    )
+
+    # Recording stays disabled until the capture backend is loaded
+    start_button.config(state="disabled")
+    stop_button.config(state="disabled")
+    root.after_idle(threading.Thread(target=load_backends, daemon=True).start)
+    enable_when_ready(root, status_label, [start_button, stop_button])
+    return root
+
+
+def main():
+    """Create the GUI and run the Tkinter main event loop."""
+    root = build_window()
     root.mainloop()
 
 
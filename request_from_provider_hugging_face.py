@@ -1,35 +1,115 @@
-from huggingface_hub import InferenceClient
-import yaml
+import os
+import tempfile
+from providers import get_hf_client
+import response_cache
 
+# model="deepseek-ai/DeepSeek-R1",
+# model="meta-llama/Meta-Llama-3-70B-Instruct",
+# model="meta-llama/Llama-2-7b-chat-hf",
+# model="deepseek-ai/DeepSeek-R1-Distill-Llama-8B",
+MODEL_ID = "deepseek-ai/DeepSeek-R1-Distill-Qwen-32B"
+RESPONSE_FILE = "transcriptions/response.txt"
 
-def query_huggingface_api(content: str = "who are you?"):
-    # Load the YAML config
-    with open("config.yaml", "r") as file:
-        config = yaml.safe_load(file)
+# Repeated questions are answered from here without calling the model
+cache = response_cache.from_config()
 
-    DS_API_TOKEN = config["api_keys"]["huggingface"]
 
-    client = InferenceClient(
-        # provider="hyperbolic",
-        provider="hf-inference",
-        api_key=DS_API_TOKEN,
-    )
+def query_huggingface_api(content: str = "who are you?", history=None):
+    """`history`: earlier messages to send ahead of `content`, if any."""
+    message = ask(content, history)
+    # save to file, cached answers too
+    save_response(message.content)
+    return message
+
+
+@response_cache.cached_answer(cache)
+def ask(content: str, history=None):
+    """The model's answer message, from the cache when possible."""
+    client = get_hf_client()
 
-    messages = [{"role": "user", "content": content}]
+    messages = list(history or []) + [{"role": "user", "content": content}]
 
     completion = client.chat.completions.create(
-        # model="deepseek-ai/DeepSeek-R1",
-        # model="meta-llama/Meta-Llama-3-70B-Instruct",
-        # model="meta-llama/Llama-2-7b-chat-hf",
-        model="deepseek-ai/DeepSeek-R1-Distill-Qwen-32B",
-        # model="deepseek-ai/DeepSeek-R1-Distill-Llama-8B",
+        model=MODEL_ID,
         messages=messages,
         max_tokens=500,
     )
 
     # print(completion.choices[0].message.content)
-    # save to file
-    with open("transcriptions/response.txt", "w") as file:
-        file.write(completion.choices[0].message.content)
-
     return completion.choices[0].message
+
+
+def stream_huggingface_api(content: str = "who are you?", history=None):
+    """
+    Like query_huggingface_api, but yields the answer text piece by piece
+    while it is being generated. The full answer is saved once done.
+    """
+    return saved(stream_chat(content, history))
+
+
+@response_cache.cached_stream(cache)
+def stream_chat(content: str, history=None):
+    """The answer text piece by piece, from the cache when possible."""
+    client = get_hf_client()
+
+    messages = list(history or []) + [{"role": "user", "content": content}]
+
+    stream = client.chat.completions.create(
+        model=MODEL_ID,
+        messages=messages,
+        max_tokens=500,
+        stream=True,
+    )
+
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
+
+
+def saved(pieces, path=RESPONSE_FILE):
+    """
+    Pass a streamed answer through unchanged and save it to `path` once
+    done, even if the caller stopped listening early.
+    """
+    answer = []
+    try:
+        for piece in pieces:
+            answer.append(piece)
+            yield piece
+    finally:
+        if hasattr(pieces, "close"):
+            pieces.close()
+        save_response("".join(answer), path)
+
+
+def save_response(text, path=RESPONSE_FILE):
+    """
+    Replace `path` with the latest answer. Written to a temporary file and
+    renamed, so a reader never sees a half-written answer.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as file:
+        file.write(text)
+    os.replace(tmp, path)
+
+
+def summarize_conversation(summary, messages):
+    """Fold `messages` into the running conversation `summary`."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    completion = get_hf_client().chat.completions.create(
+        model=MODEL_ID,
+        messages=[
+            {
+                "role": "user",
+                "content": "Update this summary of a conversation with the new "
+                "messages. Keep names, facts and open questions, drop small talk. "
+                "Reply with the summary only.\n\n"
+                f"Summary so far: {summary or '(none)'}\n\nNew messages:\n{transcript}",
+            }
+        ],
+        max_tokens=200,
+    )
+    return completion.choices[0].message.content.strip()
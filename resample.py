@@ -0,0 +1,61 @@
+from functools import lru_cache
+from math import gcd
+import numpy as np
+
+# --- Settings ---
+WHISPER_SAMPLE_RATE = 16000
+TAPS_PER_PHASE = 24  # at the slower of the two rates
+CHUNK = 1 << 15  # output samples computed per vectorized step
+
+
+@lru_cache(maxsize=8)
+def _polyphase_filter(up, down):
+    """Kaiser-windowed sinc low-pass split into `up` phases of FIR taps."""
+    # Roll off a little below the output Nyquist to keep aliasing down
+    cutoff = 0.9 / max(up, down)
+    # The filter spans TAPS_PER_PHASE periods of the cutoff, so decimating
+    # (down > up) needs more taps per phase than interpolating
+    per_phase = -(-TAPS_PER_PHASE * max(up, down) // up)
+    n_taps = per_phase * up
+    # Odd length, so the centre is on a tap (the delay resample_poly takes
+    # off); an even count is made up with a trailing zero
+    length = n_taps - 1 + n_taps % 2
+    t = np.arange(length) - (length - 1) / 2
+    h = cutoff * np.sinc(cutoff * t) * np.kaiser(length, 5.0)
+    h = np.append(h * up / h.sum(), np.zeros(n_taps - length))
+    # phases[p, j] multiplies x[i - j] for outputs landing on phase p
+    return h.reshape(per_phase, up).T.astype(np.float32).copy()
+
+
+def resample_poly(audio, up, down):
+    """Resample 1-D float32 audio by up/down with a polyphase FIR filter."""
+    g = gcd(up, down)
+    up, down = up // g, down // g
+    audio = np.asarray(audio, dtype=np.float32)
+    if up == down:
+        return audio
+    phases = _polyphase_filter(up, down)
+    per_phase = phases.shape[1]
+
+    # Pad so every tap reads a real sample and the filter delay cancels out
+    delay = (per_phase * up - 1) // 2
+    padded = np.concatenate(
+        (np.zeros(per_phase, np.float32), audio, np.zeros(per_phase, np.float32))
+    )
+    n_out = -(-len(audio) * up // down)
+    out = np.empty(n_out, dtype=np.float32)
+    taps = np.arange(per_phase)
+    for start in range(0, n_out, CHUNK):
+        m = np.arange(start, min(start + CHUNK, n_out))
+        pos = m * down + delay
+        base = pos // up + per_phase
+        windows = padded[base[:, None] - taps[None, :]]
+        out[start : start + len(m)] = np.einsum("ij,ij->i", windows, phases[pos % up])
+    return out
+
+
+def to_whisper_rate(audio, sample_rate):
+    """Convert mono float32 audio to the 16 kHz rate Whisper expects."""
+    if sample_rate == WHISPER_SAMPLE_RATE:
+        return np.asarray(audio, dtype=np.float32)
+    return resample_poly(audio, WHISPER_SAMPLE_RATE, sample_rate)
@@ -0,0 +1,258 @@
+from collections import OrderedDict
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import re
+import threading
+import time
+import numpy as np
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Punctuation and case don't change the question: "Who are you?" == "who are you"
+_NOT_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    return _SPACES.sub(" ", _NOT_WORD.sub(" ", text.lower())).strip()
+
+
+class ResponseCache:
+    """
+    Cache of model answers keyed by the question, within a namespace (the
+    decorators use the function and the conversation history, see `_key`).
+
+    Lookups first try the normalised question as an exact key. If that
+    misses and an `embed` function (text -> vector) is given, the closest
+    cached question by cosine similarity is used when it scores at least
+    `similarity`. Entries expire after `ttl_seconds` and the least
+    recently used are dropped beyond `max_entries`.
+
+    `saved_seconds` adds up, for every hit, how long the original call
+    took, which is roughly the latency the cache saved.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=3600, embed=None, similarity=0.9):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embed = embed
+        self.similarity = similarity
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        # (namespace, normalised question) -> (answer, vector, latency, stored at)
+        self._entries = OrderedDict()
+        self._vectors = {}  # embeddings computed on a miss, reused by `put`
+
+    def get(self, question, namespace=""):
+        key = (namespace, normalize(question))
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                self.saved_seconds += entry[2]
+                return entry[0]
+
+        if self.embed is not None:
+            vector = self._unit(self.embed(key[1]))
+            with self._lock:
+                if len(self._vectors) > self.max_entries:
+                    self._vectors.clear()  # misses that never got an answer
+                self._vectors[key] = vector
+                match = self._closest(namespace, vector)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    entry = self._entries[match]
+                    self.semantic_hits += 1
+                    self.saved_seconds += entry[2]
+                    return entry[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question, answer, latency, namespace=""):
+        """Store `answer`; `latency` is how long producing it took."""
+        key = (namespace, normalize(question))
+        with self._lock:
+            vector = self._vectors.pop(key, None)
+            self._entries[key] = (answer, vector, latency, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "entries": len(self._entries),
+        }
+
+    def _closest(self, namespace, vector):
+        best, best_score = None, self.similarity
+        for key, (_, other, _, _) in self._entries.items():
+            if key[0] != namespace or other is None:
+                continue
+            score = float(np.dot(vector, other))
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        for key in [k for k, e in self._entries.items() if e[3] < cutoff]:
+            del self._entries[key]
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def from_config():
+    """Cache sized from the `response_cache_*` settings, or None if disabled."""
+    from providers import get_config, get_hf_client
+
+    settings = get_config()["settings"]
+    if not settings.get("response_cache", True):
+        return None
+
+    def hf_embed(text):
+        return get_hf_client().feature_extraction(text, model=EMBED_MODEL)
+
+    semantic = settings.get("response_cache_semantic", False)
+    return ResponseCache(
+        max_entries=settings.get("response_cache_entries", 1000),
+        ttl_seconds=settings.get("response_cache_ttl", 3600),
+        embed=hf_embed if semantic else None,
+    )
+
+
+def _key(fn, args, kwargs):
+    """
+    (question, namespace) for a call: the value of `fn`'s first parameter,
+    and a namespace of the function's name plus, when the call passes a
+    conversation `history`, a hash of it. An answer is only reused for the
+    same question after the same history, so with conversation memory on
+    hits are mostly first turns (which may carry just the system prompt).
+    """
+    bound = inspect.signature(fn).bind(*args, **kwargs)
+    bound.apply_defaults()
+    question = next(iter(bound.arguments.values()))
+    history = bound.arguments.get("history")
+    if not history:
+        return question, fn.__name__
+    digest = hashlib.sha1(json.dumps(history, sort_keys=True).encode()).hexdigest()
+    return question, f"{fn.__name__}:{digest[:16]}"
+
+
+async def _call(fn, *args):
+    return fn(*args)
+
+
+def cached_answer(cache):
+    """
+    Decorator: serve `fn(question, ...)` from `cache` when possible.
+    Works on coroutine functions too. A `cache` of None leaves `fn` alone.
+    """
+
+    def decorate(fn):
+        if cache is None:
+            return fn
+
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                question, namespace = _key(fn, args, kwargs)
+                # Embedding the question is a blocking HTTP call
+                lookup = asyncio.to_thread if cache.embed is not None else _call
+                answer = await lookup(cache.get, question, namespace)
+                if answer is not None:
+                    return answer
+                start = time.perf_counter()
+                answer = await fn(*args, **kwargs)
+                cache.put(question, answer, time.perf_counter() - start, namespace)
+                return answer
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            question, namespace = _key(fn, args, kwargs)
+            answer = cache.get(question, namespace)
+            if answer is not None:
+                print(f"Response cache hit, {cache.stats()}")
+                return answer
+            start = time.perf_counter()
+            answer = fn(*args, **kwargs)
+            cache.put(question, answer, time.perf_counter() - start, namespace)
+            return answer
+
+        return wrapper
+
+    return decorate
+
+
+def cached_stream(cache):
+    """
+    Decorator for generators (sync or async) of text pieces: a hit yields
+    the whole cached answer at once; a miss is stored only if the stream
+    ran to the end.
+    """
+
+    def decorate(fn):
+        if cache is None:
+            return fn
+
+        if inspect.isasyncgenfunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                question, namespace = _key(fn, args, kwargs)
+                lookup = asyncio.to_thread if cache.embed is not None else _call
+                answer = await lookup(cache.get, question, namespace)
+                if answer is not None:
+                    yield answer
+                    return
+                start = time.perf_counter()
+                pieces = []
+                async for piece in fn(*args, **kwargs):
+                    pieces.append(piece)
+                    yield piece
+                cache.put(
+                    question, "".join(pieces), time.perf_counter() - start, namespace
+                )
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            question, namespace = _key(fn, args, kwargs)
+            answer = cache.get(question, namespace)
+            if answer is not None:
+                print(f"Response cache hit, {cache.stats()}")
+                yield answer
+                return
+            start = time.perf_counter()
+            pieces = []
+            for piece in fn(*args, **kwargs):
+                pieces.append(piece)
+                yield piece
+            cache.put(question, "".join(pieces), time.perf_counter() - start, namespace)
+
+        return wrapper
+
+    return decorate
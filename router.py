@@ -0,0 +1,423 @@
+"""
+One way to ask an LLM, whichever backend answers.
+
+A provider is a function `stream(content, history=None)` yielding the
+answer text piece by piece. The router keeps, per provider, the recent
+time to first token and error rate, and sends each question to the one
+expected to answer first. If that one hasn't produced a token by its own
+p95, the next one is asked as well (a hedged request); whichever answers
+first is streamed back and the other is cancelled, so only one answer is
+paid for beyond its first chunk. A provider that fails before answering
+is replaced by the next straight away, and one that keeps failing is left
+out for a while.
+
+Providers are listed in `settings.llm_providers`: "huggingface",
+"deepseek", or the URL of one of our own /ask/stream servers (API.py,
+hugging_face_api.py).
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+import json
+import queue
+import socket
+import threading
+import time
+import numpy as np
+import response_cache
+
+# --- Settings ---
+HEDGE_SECONDS = 1.5  # hedge delay until a provider has MIN_SAMPLES timings
+MIN_SAMPLES = 5
+WINDOW = 100  # recent turns per provider behind the latency and error rate
+ERROR_PENALTY = 4  # a 25% error rate doubles a provider's expected latency
+FAILURES_BEFORE_COOLDOWN = 3
+COOLDOWN_SECONDS = 30
+MAX_IN_FLIGHT = 2
+DEEPSEEK_MODEL = "deepseek-chat"
+
+# The attempt whose thread this is, for abort_on_cancel
+_running = threading.local()
+
+
+@contextmanager
+def abort_on_cancel(abort):
+    """
+    Within this block, cancelling the attempt running the provider calls
+    `abort()` from the router's thread. A cancelled loser still waiting
+    for its first token would otherwise hold its upstream request open
+    until that token arrives, as the cancel is only seen between chunks.
+    """
+    attempt = getattr(_running, "attempt", None)
+    if attempt is None or abort is None:
+        yield
+        return
+    attempt.add_abort(abort)
+    try:
+        yield
+    finally:
+        attempt.remove_abort(abort)
+
+
+def shut_down(sock):
+    """
+    Abort for a streamed HTTP/1.1 response: shutting its socket down makes
+    a read blocked on it return at once, which closing the response from
+    another thread does not, and the server sees the client go away.
+    None when there is no socket to shut down.
+    """
+    if sock is None:
+        return None
+
+    def abort():
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # already closed
+
+    return abort
+
+
+def stream_huggingface(content, history=None):
+    from request_from_provider_hugging_face import stream_chat
+
+    # The router caches answers itself, whichever provider gave them. Nothing
+    # is saved here either: a cancelled loser would overwrite response.txt
+    # with its first chunk, so callers save the answer they were given.
+    # The hub keeps its HTTP response to itself, so a cancel is only seen
+    # once the next chunk arrives.
+    stream = getattr(stream_chat, "__wrapped__", stream_chat)
+    return stream(content, history)
+
+
+def stream_deepseek(content, history=None):
+    from providers import get_deepseek_client
+
+    messages = list(history or []) + [{"role": "user", "content": content}]
+    stream = get_deepseek_client().chat.completions.create(
+        model=DEEPSEEK_MODEL, messages=messages, max_tokens=500, stream=True
+    )
+    # Only an HTTP/1.1 connection carries this request alone; an HTTP/2 one
+    # is shared, so there the cancel waits for the next chunk
+    response = stream.response
+    network = response.extensions.get("network_stream")
+    sock = network.get_extra_info("socket") if network is not None else None
+    abort = shut_down(sock) if response.http_version == "HTTP/1.1" else None
+    try:
+        with abort_on_cancel(abort):
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+    finally:
+        stream.close()
+
+
+def stream_from_server(url):
+    """Provider for one of our own servers' POST /ask/stream endpoint."""
+    from sse import parse_events
+
+    def stream(content, history=None):
+        from providers import get_http_session
+
+        messages = list(history or []) + [{"role": "user", "content": content}]
+        with get_http_session().post(
+            f"{url.rstrip('/')}/ask/stream", json={"messages": messages}, stream=True
+        ) as response, abort_on_cancel(
+            shut_down(getattr(response.raw.connection, "sock", None))
+        ):
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            lines = response.iter_lines(chunk_size=None, decode_unicode=True)
+            for name, data in parse_events(lines):
+                if name == "done":
+                    return
+                if name == "error":
+                    raise RuntimeError(json.loads(data))
+                yield json.loads(data)
+
+    return stream
+
+
+PROVIDERS = {"huggingface": stream_huggingface, "deepseek": stream_deepseek}
+
+
+class ProviderStats:
+    def __init__(self, window=WINDOW):
+        self.first_token = deque(maxlen=window)  # seconds
+        # Elapsed time when it was cancelled as the loser: only a lower bound
+        # on its first-token latency, so kept apart from the real timings
+        self.cut_off = deque(maxlen=window)
+        self.errors = deque(maxlen=window)  # 1 per failed turn, 0 per answer
+        self.failures_in_a_row = 0
+        self.down_until = 0.0
+        self.wins = 0
+        self.hedges = 0  # times it was asked as the hedge
+        self.cancelled = 0
+
+    @property
+    def error_rate(self):
+        return sum(self.errors) / len(self.errors) if self.errors else 0.0
+
+    def expected_latency(self):
+        """Ranking score; a provider never tried goes before the others."""
+        if self.first_token:
+            latency = float(np.median(self.first_token))
+        elif self.cut_off:
+            # Never timed, only seen losing: it is at least this slow
+            latency = max(self.cut_off)
+        else:
+            return float("inf") if self.errors else 0.0
+        return latency * (1 + ERROR_PENALTY * self.error_rate)
+
+    def hedge_delay(self, default):
+        if len(self.first_token) < MIN_SAMPLES:
+            return default
+        return float(np.percentile(self.first_token, 95))
+
+    def summary(self):
+        return {
+            "p50_ms": (
+                round(float(np.median(self.first_token)) * 1000, 1)
+                if self.first_token
+                else None
+            ),
+            "error_rate": round(self.error_rate, 3),
+            "wins": self.wins,
+            "hedges": self.hedges,
+            "cancelled": self.cancelled,
+            "down": self.down_until > time.monotonic(),
+        }
+
+
+class _Attempt:
+    """One provider streaming an answer into the router's queue on a thread."""
+
+    def __init__(self, name, start_stream, content, history, results):
+        self.name = name
+        self.started = time.perf_counter()
+        self.cancelled = threading.Event()
+        self.finished = False
+        self._aborts = []
+        self._lock = threading.Lock()
+        threading.Thread(
+            target=self._run,
+            args=(start_stream, content, history, results),
+            daemon=True,
+        ).start()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled.set()
+            for abort in self._aborts:
+                abort()
+            self._aborts.clear()
+
+    def add_abort(self, abort):
+        with self._lock:
+            if self.cancelled.is_set():
+                abort()
+            else:
+                self._aborts.append(abort)
+
+    def remove_abort(self, abort):
+        # Under the lock, so an abort never runs once its block is left and
+        # the connection may be back in the pool
+        with self._lock:
+            if abort in self._aborts:
+                self._aborts.remove(abort)
+
+    def _run(self, start_stream, content, history, results):
+        _running.attempt = self
+        stream = None
+        try:
+            stream = start_stream(content, history)
+            for piece in stream:
+                if self.cancelled.is_set():
+                    break
+                results.put((self, "piece", piece))
+        except Exception as e:
+            # An aborted request fails; that is the cancel, not an error
+            results.put((self, "done" if self.cancelled.is_set() else "error", e))
+            return
+        finally:
+            if stream is not None:
+                stream.close()  # stops the upstream generation too
+        results.put((self, "done", None))
+
+
+class Router:
+    """
+    Sends each question to the provider expected to answer first, hedging
+    and failing over as described above. `providers` maps names to
+    stream functions, in order of preference while nothing is known.
+    """
+
+    def __init__(self, providers, hedge=True, hedge_seconds=HEDGE_SECONDS):
+        self.providers = dict(providers)
+        self.hedge = hedge
+        self.hedge_seconds = hedge_seconds
+        self.stats = {name: ProviderStats() for name in self.providers}
+        self._lock = threading.Lock()
+
+    def ranked(self):
+        """Provider names, best first; those cooling down go last."""
+        now = time.monotonic()
+        with self._lock:
+            return sorted(
+                self.providers,
+                key=lambda name: (
+                    self.stats[name].down_until > now,
+                    self.stats[name].expected_latency(),
+                ),
+            )
+
+    def stream(self, content, history=None):
+        """Yield the answer from whichever provider starts answering first."""
+        order = self.ranked()
+        results = queue.Queue()
+        attempts = []
+        winner = None
+        error = None
+
+        def launch():
+            name = order[len(attempts)]
+            attempts.append(
+                _Attempt(name, self.providers[name], content, history, results)
+            )
+            with self._lock:
+                delay = self.stats[name].hedge_delay(self.hedge_seconds)
+            return time.monotonic() + delay
+
+        deadline = launch()
+        try:
+            while winner is None:
+                in_flight = [a for a in attempts if not a.finished]
+                if not in_flight:
+                    if len(attempts) == len(order):
+                        raise error
+                    print(
+                        f"{attempts[-1].name} failed ({error}), "
+                        f"trying {order[len(attempts)]}"
+                    )
+                    deadline = launch()
+                    continue
+                can_hedge = (
+                    self.hedge
+                    and len(attempts) < len(order)
+                    and len(in_flight) < MAX_IN_FLIGHT
+                )
+                try:
+                    attempt, kind, value = results.get(
+                        timeout=(
+                            max(0.0, deadline - time.monotonic()) if can_hedge else None
+                        )
+                    )
+                except queue.Empty:
+                    print(
+                        f"No answer from {in_flight[0].name} after "
+                        f"{in_flight[0].elapsed:.2f} s, also asking "
+                        f"{order[len(attempts)]}"
+                    )
+                    deadline = launch()
+                    with self._lock:
+                        self.stats[attempts[-1].name].hedges += 1
+                    continue
+                if kind == "error":
+                    attempt.finished = True
+                    error = value
+                    self._failed(attempt.name)
+                    continue
+                winner = attempt
+                self._won(winner, [a for a in attempts if a is not winner])
+                if kind == "done":
+                    return  # an empty answer
+                yield value
+
+            for attempt, kind, value in iter(results.get, None):
+                if attempt is not winner:
+                    continue  # a cancelled loser's last chunk
+                if kind == "done":
+                    return
+                if kind == "error":
+                    self._failed(winner.name)
+                    raise value  # too late to fail over half way through
+                yield value
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def query(self, content, history=None):
+        return "".join(self.stream(content, history))
+
+    def summary(self):
+        with self._lock:
+            return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def _won(self, winner, losers):
+        with self._lock:
+            stats = self.stats[winner.name]
+            stats.first_token.append(winner.elapsed)
+            stats.errors.append(0)
+            stats.failures_in_a_row = 0
+            stats.wins += 1
+            for loser in losers:
+                if loser.finished:
+                    continue
+                loser.cancel()
+                self.stats[loser.name].cut_off.append(loser.elapsed)
+                self.stats[loser.name].cancelled += 1
+
+    def _failed(self, name):
+        with self._lock:
+            stats = self.stats[name]
+            stats.errors.append(1)
+            stats.failures_in_a_row += 1
+            if stats.failures_in_a_row >= FAILURES_BEFORE_COOLDOWN:
+                stats.down_until = time.monotonic() + COOLDOWN_SECONDS
+                stats.failures_in_a_row = 0
+                print(f"{name} keeps failing, leaving it out for {COOLDOWN_SECONDS} s")
+
+
+def provider(name):
+    """The stream function for a provider name or server URL."""
+    if name.startswith(("http://", "https://")):
+        return stream_from_server(name)
+    if name not in PROVIDERS:
+        raise ValueError(
+            f"Unknown LLM provider {name!r}, expected one of {list(PROVIDERS)} or a URL"
+        )
+    return PROVIDERS[name]
+
+
+@lru_cache(maxsize=None)
+def get_router():
+    """The process-wide router over `settings.llm_providers`."""
+    from providers import get_config
+
+    settings = get_config()["settings"]
+    names = settings.get("llm_providers") or ["huggingface"]
+    return Router(
+        {name: provider(name) for name in names},
+        hedge=settings.get("llm_hedge", True),
+        hedge_seconds=settings.get("llm_hedge_seconds", HEDGE_SECONDS),
+    )
+
+
+# Repeated questions are answered from here without calling any provider
+cache = response_cache.from_config()
+
+
+@response_cache.cached_stream(cache)
+def stream_answer(content: str, history=None):
+    yield from get_router().stream(content, history)
+
+
+@response_cache.cached_answer(cache)
+def query_answer(content: str, history=None):
+    return get_router().query(content, history)
@@ -0,0 +1,69 @@
+import queue
+import re
+import threading
+
+# A sentence ends at . ! ? or … followed by whitespace, or at a newline
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+
+def iter_sentences(chunks):
+    """Regroup a stream of text pieces into sentences as soon as each is complete."""
+    pending = ""
+    try:
+        for chunk in chunks:
+            pending += chunk
+            *complete, pending = SENTENCE_END.split(pending)
+            for sentence in complete:
+                if sentence.strip():
+                    yield sentence.strip()
+        if pending.strip():
+            yield pending.strip()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def background_iter(items, cancelled=None, maxsize=0):
+    """
+    Pull `items` on a background thread and return an iterator over them,
+    so the producer keeps working while the consumer is busy with earlier
+    items. Errors are re-raised in the consumer. Once the `cancelled`
+    event is set the producer stops and what is left is dropped.
+    """
+    buffered = queue.Queue(maxsize)
+
+    def produce():
+        try:
+            for item in items:
+                if cancelled is not None and cancelled.is_set():
+                    break
+                buffered.put(item)
+        except Exception as e:
+            buffered.put(e)
+        finally:
+            if hasattr(items, "close"):
+                items.close()
+            buffered.put(None)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    def consume():
+        while True:
+            item = buffered.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            if cancelled is not None and cancelled.is_set():
+                continue  # keep draining so the producer can finish
+            yield item
+
+    return consume()
+
+
+def background_sentences(chunks, cancelled=None):
+    """
+    Pull `chunks` on a background thread and return an iterator over the
+    sentences, so generation keeps going while earlier ones are spoken.
+    """
+    return background_iter(iter_sentences(chunks), cancelled)
@@ -0,0 +1,169 @@
+import threading
+import time
+from conversation import approx_tokens
+from response_cache import normalize
+
+
+class SpeculationStats:
+    """Running totals over every take, to judge whether speculating pays off."""
+
+    def __init__(self):
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+        self.wasted_seconds = 0.0
+        self.wasted_tokens = 0
+        self._lock = threading.Lock()
+
+    def hit(self, head_start, tokens):
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += head_start
+            self.saved_tokens += tokens
+
+    def waste(self, seconds, tokens):
+        with self._lock:
+            self.wasted += 1
+            self.wasted_seconds += seconds
+            self.wasted_tokens += tokens
+
+    def summary(self):
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "wasted": self.wasted,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "saved_tokens": self.saved_tokens,
+            "wasted_seconds": round(self.wasted_seconds, 3),
+            "wasted_tokens": self.wasted_tokens,
+        }
+
+
+class Speculation:
+    """One answer being generated in the background for a guessed question."""
+
+    def __init__(self, question, history, start_stream):
+        self.question = question
+        self.history = history
+        self.started = time.perf_counter()
+        self.finished = None
+        self.pieces = []
+        self.cancelled = threading.Event()
+        self._changed = threading.Condition()
+        self._done = False
+        self._error = None
+        threading.Thread(
+            target=self._run, args=(start_stream(question, history),), daemon=True
+        ).start()
+
+    @property
+    def tokens(self):
+        return approx_tokens("".join(self.pieces))
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def replay(self):
+        """
+        Every piece so far, then the rest as it arrives. Closing it early
+        (e.g. the turn was cancelled) stops the generation as well.
+        """
+        sent = 0
+        try:
+            while True:
+                with self._changed:
+                    while sent == len(self.pieces) and not self._done:
+                        self._changed.wait()
+                    pieces = self.pieces[sent:]
+                    done, error = self._done, self._error
+                yield from pieces
+                sent += len(pieces)
+                if done and sent == len(self.pieces):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            self.cancel()
+
+    def _run(self, stream):
+        try:
+            for piece in stream:
+                if self.cancelled.is_set():
+                    break
+                with self._changed:
+                    self.pieces.append(piece)
+                    self._changed.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            stream.close()  # stops the upstream generation too
+            self.finished = time.perf_counter()
+            with self._changed:
+                self._done = True
+                self._changed.notify_all()
+
+
+class Speculator:
+    """
+    Start answering before the user has finished speaking.
+
+    Fed every partial transcript of a take through `observe`. Once two
+    consecutive partials agree (the user has paused), it starts
+    `start_stream(question, history)` in the background. A newer, different
+    partial cancels that guess and, once stable, starts another.
+
+    When the take ends, `take(final, history)` returns the speculative
+    answer stream if the final transcript and history match the guess, or
+    None after cancelling it, in which case the caller asks as usual.
+    """
+
+    def __init__(self, start_stream, get_history=None, stats=None, min_chars=8):
+        self.start_stream = start_stream
+        self.get_history = get_history or (lambda: None)
+        self.stats = stats or SpeculationStats()
+        self.min_chars = min_chars
+        self.current = None
+        self._last_partial = None
+        self._lock = threading.Lock()
+
+    def observe(self, partial):
+        key = normalize(partial)
+        with self._lock:
+            stable, self._last_partial = key == self._last_partial, key
+            if not stable or len(key) < self.min_chars:
+                return
+            if self.current is not None:
+                if normalize(self.current.question) == key:
+                    return
+                self._discard()
+            self.current = Speculation(partial, self.get_history(), self.start_stream)
+            self.stats.started += 1
+
+    def take(self, final, history=None):
+        with self._lock:
+            guess, self.current = self.current, None
+        if guess is None:
+            return None
+        if normalize(guess.question) != normalize(final) or guess.history != history:
+            with self._lock:
+                self.current = guess
+                self._discard()
+            return None
+        self.stats.hit(guess.elapsed, guess.tokens)
+        return guess.replay()
+
+    def cancel(self):
+        with self._lock:
+            self._discard()
+
+    def _discard(self):
+        guess, self.current = self.current, None
+        if guess is not None:
+            guess.cancel()
+            self.stats.waste(guess.elapsed, guess.tokens)
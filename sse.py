@@ -0,0 +1,80 @@
+"""
+Server-Sent Events helpers for the /ask/stream endpoints and their clients.
+
+Each piece of text goes out as its own `data:` event, JSON-encoded so
+newlines inside a token can't break the framing. The stream ends with an
+`event: done`, or an `event: error` carrying the message if generation
+failed half way.
+"""
+
+import json
+
+
+def event(data, name=None):
+    prefix = f"event: {name}\n" if name else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def sse_response(pieces):
+    """StreamingResponse sending every string from `pieces` (sync or async)."""
+    from fastapi.responses import StreamingResponse
+
+    if hasattr(pieces, "__aiter__"):
+
+        async def events():
+            try:
+                async for piece in pieces:
+                    yield event(piece)
+            except Exception as e:
+                yield event(str(e), "error")
+                return
+            yield event("", "done")
+
+    else:
+
+        def events():
+            try:
+                for piece in pieces:
+                    yield event(piece)
+            except Exception as e:
+                yield event(str(e), "error")
+                return
+            yield event("", "done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def parse_events(lines):
+    """(name, data) for every event in an iterable of decoded SSE lines."""
+    name, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield name, "\n".join(data)
+            name, data = "message", []
+        elif line.startswith("event:"):
+            name = line[len("event:") :].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:") :].strip())
+    if data:
+        yield name, "\n".join(data)
+
+
+async def upstream_tokens(response):
+    """
+    Text of each generated token from a streaming Hugging Face
+    text-generation response (httpx, opened with `stream`).
+    """
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        payload = json.loads(line[len("data:") :])
+        if "error" in payload:
+            raise ValueError(payload["error"])
+        token = payload.get("token") or {}
+        if not token.get("special"):
+            yield token.get("text", "")
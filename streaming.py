@@ -0,0 +1,190 @@
+import threading
+import numpy as np
+from resample import to_whisper_rate
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size ring buffer of mono float32 samples.
+
+    Samples are addressed by their absolute index since the start of the
+    recording, so readers can ask for a window without caring about where
+    the write head currently wraps around.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._lock = threading.Lock()
+        self.total_written = 0
+
+    def write(self, samples):
+        """Append samples, overwriting the oldest ones once full."""
+        n = len(samples)
+        if n >= self.capacity:
+            samples = samples[-self.capacity :]
+        with self._lock:
+            m = len(samples)
+            start = (self.total_written + n - m) % self.capacity
+            first = min(m, self.capacity - start)
+            self._data[start : start + first] = samples[:first]
+            self._data[: m - first] = samples[first:]
+            self.total_written += n
+
+    def oldest(self):
+        """Absolute index of the oldest sample still held."""
+        return max(0, self.total_written - self.capacity)
+
+    def read(self, start, end):
+        """Return a copy of samples [start, end) by absolute index."""
+        with self._lock:
+            start = max(start, self.oldest())
+            end = min(end, self.total_written)
+            if end <= start:
+                return np.zeros(0, dtype=np.float32)
+            i = start % self.capacity
+            j = i + (end - start)
+            if j <= self.capacity:
+                return self._data[i:j].copy()
+            return np.concatenate((self._data[i:], self._data[: j - self.capacity]))
+
+
+class StreamingTranscriber:
+    """
+    Transcribe audio in overlapping windows while it is still being recorded.
+
+    `feed` is meant to be called from the sounddevice callback and only
+    copies samples into the ring buffer. Every `step_seconds` a background
+    worker transcribes up to `window_seconds` of audio after the last
+    committed point. Whisper segments ending before the last
+    `overlap_seconds` of that window are committed and the next window
+    starts from there, so words cut at a window boundary are re-heard.
+    When the recording stops, `finish` only has to transcribe the tail.
+
+    Pass a `buffer` (e.g. the GUI's `audio_buffer.CaptureBuffer`) to read
+    windows straight from the capture storage; the callback then writes
+    there and only calls `wake`.
+    """
+
+    def __init__(
+        self,
+        model,
+        sample_rate,
+        window_seconds=20.0,
+        step_seconds=2.0,
+        overlap_seconds=2.0,
+        on_partial=None,
+        buffer=None,
+        **transcribe_options,
+    ):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.window = int(window_seconds * sample_rate)
+        self.step = int(step_seconds * sample_rate)
+        self.overlap = int(overlap_seconds * sample_rate)
+        self.on_partial = on_partial
+        self.transcribe_options = transcribe_options
+
+        # Twice the window leaves room for the worker to fall behind a bit
+        self.buffer = buffer if buffer is not None else AudioRingBuffer(2 * self.window)
+        self.committed_until = 0
+        self.committed_text = ""
+        self.partial_text = ""
+
+        self._wakeup = threading.Condition()
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._worker.start()
+        return self
+
+    def feed(self, samples):
+        """Push a block of mono samples (called from the audio callback)."""
+        self.buffer.write(samples)
+        self.wake()
+
+    def wake(self):
+        """Tell the worker new samples have landed in the buffer."""
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def finish(self, end=None):
+        """
+        Stop the worker, transcribe the remaining tail and return the text.
+        `end` cuts the tail short, e.g. at the end of detected speech.
+        """
+        self.stop()
+        if end is None:
+            end = self.buffer.total_written
+        tail = self._transcribe(self.committed_until, end)
+        text = self._join(self.committed_text, "".join(s["text"] for s in tail))
+        self.partial_text = text
+        return text
+
+    def stop(self):
+        """
+        Stop the worker without transcribing the tail, e.g. for a take that
+        was cancelled. Waits for a pass already under way.
+        """
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+        if self._worker.is_alive():
+            self._worker.join()
+
+    def _run(self):
+        last_pass = 0
+        while True:
+            with self._wakeup:
+                while (
+                    not self._stopped
+                    and self.buffer.total_written - last_pass < self.step
+                ):
+                    self._wakeup.wait()
+                if self._stopped:
+                    return
+            last_pass = self.buffer.total_written
+            self._step(last_pass)
+
+    def _step(self, now):
+        start = self.committed_until
+        end = min(now, start + self.window)
+        segments = self._transcribe(start, end)
+
+        window_full = end - start >= self.window
+        keep_until = (end - start - self.overlap) / self.sample_rate
+        committed = [s for s in segments if s["end"] <= keep_until]
+        if window_full and not committed:
+            # One segment spans the whole window: take it rather than stall
+            committed = segments
+
+        if committed:
+            self.committed_text = self._join(
+                self.committed_text, "".join(s["text"] for s in committed)
+            )
+            if committed is segments:
+                self.committed_until = end
+            else:
+                self.committed_until = start + int(
+                    committed[-1]["end"] * self.sample_rate
+                )
+
+        pending = "".join(s["text"] for s in segments[len(committed) :])
+        self.partial_text = self._join(self.committed_text, pending)
+        if self.on_partial is not None:
+            self.on_partial(self.partial_text)
+
+    def _transcribe(self, start, end):
+        if start < self.buffer.oldest():
+            print("Streaming transcriber fell behind, some audio was dropped.")
+            start = self.committed_until = self.buffer.oldest()
+        audio = self.buffer.read(start, end)
+        if len(audio) == 0:
+            return []
+        audio = to_whisper_rate(audio, self.sample_rate)
+        return self.model.transcribe(audio, **self.transcribe_options)["segments"]
+
+    @staticmethod
+    def _join(head, tail):
+        return (head.rstrip() + " " + tail.strip()).strip() if head else tail.strip()
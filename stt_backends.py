@@ -0,0 +1,181 @@
+"""
+Interchangeable speech-to-text backends.
+
+Every backend has the same `transcribe(audio, language=None, **options)`
+as a loaded openai-whisper model: `audio` is a mono float32 array at
+16 kHz, and the result is a dict with "text", "segments" (each with
+"start", "end" and "text") and "language". The GUIs, the streaming
+transcriber and transcription_server.py only rely on that.
+
+    openai-whisper  the reference PyTorch model, fp32 on the CPU
+    faster-whisper  CTranslate2 with int8 weights, several times faster on
+                    the CPU for the same model size
+
+Both also have `transcribe_batch(segments, language=None)`, which runs
+up to 30 s segments through one encoder pass and one batched greedy
+decode, for stt_batching.BatchedTranscriber.
+
+Pick one with `settings.stt_backend` (DEFAULT_BACKEND when unset);
+`whisper_model` is the model size, `stt_threads` the number of CPU
+threads (0 = library default) and `language` is passed on so Whisper
+skips language detection.
+"""
+
+BACKENDS = ["faster-whisper", "openai-whisper"]
+DEFAULT_BACKEND = "faster-whisper"  # when settings.stt_backend is not set
+N_SAMPLES = 30 * 16000  # Whisper's 30 s window
+N_FRAMES = 3000  # log-mel frames in that window
+
+
+def language_code(language):
+    """The language to pass to Whisper; None for "auto" (or nothing)."""
+    return None if not language or language == "auto" else language
+
+
+class OpenAIWhisper:
+    """openai-whisper's PyTorch model."""
+
+    name = "openai-whisper"
+
+    def __init__(self, model_size="base", language=None, threads=0):
+        import torch
+        import whisper
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.language = language_code(language)
+        self.model = whisper.load_model(model_size, device="cpu")
+
+    def transcribe(self, audio, language=None, **options):
+        options.setdefault("fp16", False)  # fp16 is not supported on the CPU
+        return self.model.transcribe(
+            audio, language=language_code(language) or self.language, **options
+        )
+
+    def transcribe_batch(self, segments, language=None):
+        """[{"text", "language"}] for each segment of at most 30 s."""
+        import torch
+        import whisper
+
+        mels = torch.stack(
+            [
+                whisper.log_mel_spectrogram(
+                    whisper.pad_or_trim(segment), n_mels=self.model.dims.n_mels
+                )
+                for segment in segments
+            ]
+        )
+        options = whisper.DecodingOptions(
+            language=language_code(language) or self.language,
+            without_timestamps=True,
+            fp16=False,
+        )
+        with torch.inference_mode():
+            results = whisper.decode(self.model, mels, options)
+        return [{"text": r.text, "language": r.language} for r in results]
+
+
+class FasterWhisper:
+    """CTranslate2 port of Whisper, with int8 weights by default."""
+
+    name = "faster-whisper"
+
+    def __init__(
+        self, model_size="base", language=None, threads=0, compute_type="int8"
+    ):
+        from faster_whisper import WhisperModel
+
+        self.language = language_code(language)
+        self.model = WhisperModel(
+            model_size, device="cpu", compute_type=compute_type, cpu_threads=threads
+        )
+
+    def transcribe(self, audio, language=None, **options):
+        options.pop("fp16", None)  # openai-whisper only
+        segments, info = self.model.transcribe(
+            audio, language=language_code(language) or self.language, **options
+        )
+        # `segments` is lazy: decoding happens while it is consumed
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "segments": segments,
+            "language": info.language,
+        }
+
+    def transcribe_batch(self, segments, language=None):
+        """[{"text", "language"}] for each segment of at most 30 s."""
+        import ctranslate2
+        import numpy as np
+        from faster_whisper.tokenizer import Tokenizer
+
+        # Padded to 30 s before the log-mel, as Whisper itself does
+        features = np.stack(
+            [
+                self.model.feature_extractor(
+                    np.pad(segment, (0, max(N_SAMPLES - len(segment), 0)))
+                )[:, :N_FRAMES]
+                for segment in segments
+            ]
+        ).astype(np.float32)
+        whisper = self.model.model
+        encoded = whisper.encode(ctranslate2.StorageView.from_array(features))
+
+        language = language_code(language) or self.language
+        if language is not None:
+            languages = [language] * len(segments)
+        else:
+            # Best "<|xx|>" token for every segment, from the same encoder pass
+            languages = [r[0][0][2:-2] for r in whisper.detect_language(encoded)]
+
+        # One decode per language (usually just the one)
+        results = [None] * len(segments)
+        for language in set(languages):
+            tokenizer = Tokenizer(
+                self.model.hf_tokenizer,
+                whisper.is_multilingual,
+                task="transcribe",
+                language=language,
+            )
+            prompt = tokenizer.sot_sequence + [tokenizer.no_timestamps]
+            indices = [i for i, l in enumerate(languages) if l == language]
+            decoded = whisper.generate(
+                _select(encoded, indices, len(segments)),
+                [prompt] * len(indices),
+                beam_size=1,
+            )
+            for i, result in zip(indices, decoded):
+                tokens = [t for t in result.sequences_ids[0] if t < tokenizer.eot]
+                results[i] = {"text": tokenizer.decode(tokens), "language": language}
+        return results
+
+
+def _select(encoded, indices, total):
+    """The encoder outputs for `indices`, without a copy when that is all of them."""
+    if len(indices) == total:
+        return encoded
+    import ctranslate2
+    import numpy as np
+
+    return ctranslate2.StorageView.from_array(np.asarray(encoded)[indices])
+
+
+def load_backend(name, model_size="base", language=None, threads=0):
+    if name == "faster-whisper":
+        return FasterWhisper(model_size, language, threads)
+    if name == "openai-whisper":
+        return OpenAIWhisper(model_size, language, threads)
+    raise ValueError(f"Unknown stt_backend {name!r}, expected one of {BACKENDS}")
+
+
+def load_from_config():
+    """The backend, model size, threads and language set in config.yaml."""
+    from providers import get_config
+
+    settings = get_config()["settings"]
+    return load_backend(
+        settings.get("stt_backend", DEFAULT_BACKEND),
+        model_size=settings.get("whisper_model", "base"),
+        language=settings.get("language"),
+        threads=settings.get("stt_threads", 0),
+    )
@@ -0,0 +1,143 @@
+"""
+Cross-request batching for Whisper on the CPU.
+
+A backend transcribing one clip at a time runs the encoder on a single
+30 s log-mel window per call, however many users are waiting. Wrapped in a
+BatchedTranscriber, every `transcribe` call is cut into 30 s segments that
+go into a shared queue; a MicroBatcher takes up to `max_batch` segments
+from any number of requests, pads them to 30 s and runs them through one
+encoder pass and one batched greedy decode (the backend's
+`transcribe_batch`). No segment waits more than `max_wait_ms` for others
+to join its batch.
+
+Batching is for callers that only want the text and say so with
+Whisper's own `without_timestamps=True`: long clips are then cut at fixed
+30 s boundaries rather than at predicted timestamps, and decoding is
+greedy, which for the short utterances of a voice turn costs nothing.
+Calls that need segment times (the streaming transcriber commits text up
+to a segment's end) go to the backend's own `transcribe`, one at a time.
+
+    model = from_config(load_from_config())
+    # from any number of threads
+    text = model.transcribe(audio, without_timestamps=True)["text"]
+"""
+
+from collections import Counter
+import threading
+import time
+from batching import MicroBatcher
+from resample import WHISPER_SAMPLE_RATE
+from stt_backends import N_SAMPLES, language_code
+
+# --- Settings ---
+MAX_BATCH = 8
+MAX_WAIT_MS = 50
+
+
+class BatchedTranscriber:
+    """Same `transcribe` as the backend it wraps, batched across callers."""
+
+    def __init__(self, backend, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.backend = backend
+        self.name = backend.name
+        self.max_batch = max_batch
+        self.batcher = MicroBatcher(self._run_batch, max_batch, max_wait_ms)
+        self.batch_sizes = Counter()  # batch size -> batches of that size
+        self.audio_seconds = 0.0
+        self.busy_seconds = 0.0  # time spent in the model
+        self.queued_seconds = 0.0  # segments' total wait before their batch ran
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()  # batches and unbatched calls
+
+    def transcribe(self, audio, language=None, without_timestamps=False, **options):
+        """
+        Whisper-style result. Batched with `without_timestamps`, when the
+        segments are the 30 s chunks and other `options` are ignored;
+        otherwise the backend's own timestamped segments.
+        """
+        language = language_code(language) or self.backend.language
+        if len(audio) == 0:
+            return {"text": "", "segments": [], "language": language}
+        if not without_timestamps:
+            with self._model_lock:
+                return self.backend.transcribe(audio, language=language, **options)
+
+        submitted = time.perf_counter()
+        futures = [
+            self.batcher.submit((audio[start : start + N_SAMPLES], language, submitted))
+            for start in range(0, len(audio), N_SAMPLES)
+        ]
+        results = [future.result() for future in futures]
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        segments = [
+            {
+                "start": i * N_SAMPLES / WHISPER_SAMPLE_RATE,
+                "end": min((i + 1) * N_SAMPLES / WHISPER_SAMPLE_RATE, duration),
+                "text": result["text"],
+            }
+            for i, result in enumerate(results)
+        ]
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "segments": segments,
+            "language": results[0]["language"],
+        }
+
+    def _run_batch(self, items):
+        started = time.perf_counter()
+        # Requests asking for different languages can't share a decode
+        results = [None] * len(items)
+        with self._model_lock:
+            for language in {language for _, language, _ in items}:
+                indices = [i for i, item in enumerate(items) if item[1] == language]
+                decoded = self.backend.transcribe_batch(
+                    [items[i][0] for i in indices], language
+                )
+                for i, result in zip(indices, decoded):
+                    results[i] = result
+        with self._lock:
+            self.batch_sizes[len(items)] += 1
+            self.busy_seconds += time.perf_counter() - started
+            self.queued_seconds += sum(started - t for _, _, t in items)
+            self.audio_seconds += sum(len(s) for s, _, _ in items) / WHISPER_SAMPLE_RATE
+        return results
+
+    def stats(self):
+        """Batch occupancy, queueing and model throughput so far."""
+        with self._lock:
+            batches = sum(self.batch_sizes.values())
+            segments = sum(size * n for size, n in self.batch_sizes.items())
+            return {
+                "batches": batches,
+                "segments": segments,
+                "max_batch": self.max_batch,
+                "mean_batch_size": round(segments / batches, 2) if batches else 0.0,
+                "occupancy": (
+                    round(segments / batches / self.max_batch, 3) if batches else 0.0
+                ),
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "mean_queued_ms": (
+                    round(self.queued_seconds / segments * 1000, 1) if segments else 0.0
+                ),
+                "audio_seconds": round(self.audio_seconds, 1),
+                "busy_seconds": round(self.busy_seconds, 1),
+                # Seconds of audio transcribed per second in the model
+                "throughput": (
+                    round(self.audio_seconds / self.busy_seconds, 2)
+                    if self.busy_seconds
+                    else 0.0
+                ),
+            }
+
+
+def from_config(backend):
+    """`backend` batched per the `stt_batch_*` settings, or as is for size 1."""
+    from providers import get_config
+
+    settings = get_config()["settings"]
+    max_batch = settings.get("stt_batch_size", 1)
+    if max_batch <= 1:
+        return backend
+    return BatchedTranscriber(
+        backend, max_batch, settings.get("stt_batch_wait_ms", MAX_WAIT_MS)
+    )
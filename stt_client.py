@@ -0,0 +1,55 @@
+import threading
+import numpy as np
+import requests
+
+
+class RemoteWhisperModel:
+    """
+    Stand-in for a loaded Whisper model that forwards to the warm model
+    in `transcription_server.py`, so a GUI can start without loading one.
+
+    Only `transcribe` on 16 kHz float32 arrays is supported, which is all
+    the GUIs and the streaming transcriber use.
+    """
+
+    def __init__(self, url="http://127.0.0.1:8001", timeout=120):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        # Keep the connection open between turns
+        self.session = requests.Session()
+
+    def transcribe(self, audio, language=None, without_timestamps=False, **options):
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        params = {"language": language} if language else {}
+        if without_timestamps:
+            params["without_timestamps"] = "true"
+        response = self.session.post(
+            f"{self.url}/transcribe",
+            params=params,
+            data=audio.tobytes(),
+            headers={"Content-Type": "application/octet-stream"},
+            timeout=self.timeout,
+        )
+        if response.status_code != 200:
+            raise ValueError(
+                f"Transcription server error {response.status_code}: {response.text}"
+            )
+        return response.json()
+
+    def is_available(self):
+        try:
+            return self.session.get(f"{self.url}/health", timeout=1).ok
+        except requests.RequestException:
+            return False
+
+
+class LockedModel:
+    """Serialise `transcribe` calls on a local model shared between threads."""
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, **options):
+        with self._lock:
+            return self.model.transcribe(audio, **options)
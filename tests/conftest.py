@@ -0,0 +1,17 @@
+from functools import lru_cache
+import pathlib
+import yaml
+import providers
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+# config.yaml is user-local and not tracked, so the modules that read their
+# settings at import time (router, via response_cache) get the template
+@lru_cache(maxsize=None)
+def template_config(path="config.yaml"):
+    with open(ROOT / "configTemplate.yaml", "r") as file:
+        return yaml.safe_load(file)
+
+
+providers.get_config = template_config
@@ -0,0 +1,82 @@
+import numpy as np
+from audio_buffer import CaptureBuffer
+
+SAMPLE_RATE = 16000
+
+
+def blocks(seconds, block=512, channels=1):
+    rng = np.random.default_rng(0)
+    audio = rng.standard_normal((int(seconds * SAMPLE_RATE), channels))
+    audio = audio.astype(np.float32)
+    return audio, [audio[i : i + block] for i in range(0, len(audio), block)]
+
+
+def test_grows_past_its_initial_size_and_keeps_every_frame():
+    buffer = CaptureBuffer(SAMPLE_RATE, initial_seconds=1)
+    audio, pieces = blocks(3.3)
+    for piece in pieces:
+        buffer.write(piece)
+    assert len(buffer) == len(audio)
+    assert np.array_equal(buffer.view(), audio)
+    assert np.array_equal(buffer.mono(), audio[:, 0])
+
+
+def test_storage_doubles_so_long_takes_grow_rarely():
+    buffer = CaptureBuffer(SAMPLE_RATE, initial_seconds=1)
+    allocations = []
+    for piece in blocks(20)[1]:
+        storage = buffer._data
+        buffer.write(piece)
+        if buffer._data is not storage:
+            allocations.append(len(buffer._data))
+    assert allocations == [
+        2 * SAMPLE_RATE,
+        4 * SAMPLE_RATE,
+        8 * SAMPLE_RATE,
+        16 * SAMPLE_RATE,
+        32 * SAMPLE_RATE,
+    ]
+
+
+def test_one_write_larger_than_double_the_storage():
+    buffer = CaptureBuffer(SAMPLE_RATE, initial_seconds=1)
+    audio, _ = blocks(5)
+    buffer.write(audio)
+    assert len(buffer._data) == 8 * SAMPLE_RATE
+    assert np.array_equal(buffer.view(), audio)
+
+
+def test_views_are_not_copies():
+    buffer = CaptureBuffer(SAMPLE_RATE)
+    buffer.write(blocks(1)[0])
+    assert np.shares_memory(buffer.view(), buffer._data)
+    assert np.shares_memory(buffer.mono(), buffer._data)
+    assert np.shares_memory(buffer.read(100, 200), buffer._data)
+
+
+def test_clear_keeps_the_allocation():
+    buffer = CaptureBuffer(SAMPLE_RATE, initial_seconds=1)
+    buffer.write(blocks(3)[0])
+    storage = buffer._data
+    buffer.clear()
+    assert len(buffer) == 0
+    buffer.write(blocks(2)[0])
+    assert buffer._data is storage
+
+
+def test_high_water_is_the_largest_take():
+    buffer = CaptureBuffer(SAMPLE_RATE, initial_seconds=1)
+    buffer.write(blocks(3)[0])
+    buffer.clear()
+    buffer.write(blocks(1)[0])
+    assert buffer.nbytes == SAMPLE_RATE * 4
+    assert buffer.high_water == 3 * SAMPLE_RATE * 4
+
+
+def test_stereo_mono_is_the_first_channel():
+    buffer = CaptureBuffer(SAMPLE_RATE, channels=2, initial_seconds=1)
+    audio, pieces = blocks(1.5, channels=2)
+    for piece in pieces:
+        buffer.write(piece)
+    assert np.array_equal(buffer.mono(), audio[:, 0])
+    assert np.array_equal(buffer.read(-5, 10), audio[:10, 0])
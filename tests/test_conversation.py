@@ -0,0 +1,138 @@
+from conversation import MESSAGE_OVERHEAD, ConversationStore
+
+
+def words(n):
+    """Text of n tokens, one per word, with count_tokens=count_words."""
+    return " ".join(["word"] * n)
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def store(**options):
+    return ConversationStore(count_tokens=count_words, **options)
+
+
+def roles(messages):
+    return [m["role"] for m in messages]
+
+
+def test_context_keeps_every_turn_within_the_budget():
+    conversation = store(max_tokens=1000, system_prompt="Be brief.")
+    conversation.add_turn("Hi", "Hello")
+    conversation.add_turn("How are you?", "Fine")
+    assert conversation.context() == [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello"},
+        {"role": "user", "content": "How are you?"},
+        {"role": "assistant", "content": "Fine"},
+    ]
+    assert conversation.tokens == 2 + 1 + 1 + 3 + 1 + 5 * MESSAGE_OVERHEAD
+
+
+def test_oldest_turns_are_dropped_whole():
+    # Each turn is 2 * (10 + MESSAGE_OVERHEAD) = 28 tokens
+    conversation = store(max_tokens=60)
+    for i in range(5):
+        conversation.add_turn(f"q{i} " + words(9), f"a{i} " + words(9))
+    context = conversation.context()
+    assert roles(context) == ["user", "assistant", "user", "assistant"]
+    assert context[0]["content"].startswith("q3")
+    assert conversation.tokens <= 60
+
+
+def test_context_never_starts_with_an_answer():
+    conversation = store(max_tokens=40)
+    conversation.add("user", words(5))
+    conversation.add("assistant", words(5))
+    conversation.add("assistant", words(5))  # e.g. a follow-up message
+    conversation.add_turn(words(5), words(5))
+    assert roles(conversation.context())[0] == "user"
+
+
+def test_the_latest_turn_stays_even_over_budget():
+    conversation = store(max_tokens=10)
+    conversation.add_turn(words(3), words(3))
+    conversation.add_turn(words(50), words(50))
+    context = conversation.context()
+    assert len(context) == 2
+    assert context[0]["content"] == words(50)
+
+
+def test_tokens_match_the_context_after_trimming():
+    conversation = store(max_tokens=100, system_prompt="Be brief.")
+    for i in range(20):
+        conversation.add_turn(words(i % 7 + 1), words(i % 5 + 1))
+    expected = sum(
+        count_words(m["content"]) + MESSAGE_OVERHEAD for m in conversation.context()
+    )
+    assert conversation.tokens == expected
+
+
+def test_dropped_turns_are_folded_into_the_summary():
+    calls = []
+
+    def summarize(summary, dropped):
+        calls.append((summary, [m["content"] for m in dropped]))
+        return f"{summary}+{len(dropped)}".lstrip("+")
+
+    conversation = store(max_tokens=60, summarize=summarize)
+    conversation.add_turn("q0 " + words(9), "a0 " + words(9))
+    conversation.add_turn("q1 " + words(9), "a1 " + words(9))
+    assert calls == []
+    conversation.add_turn("q2 " + words(9), "a2 " + words(9))
+    assert calls[0][0] == ""
+    assert calls[0][1][0].startswith("q0")
+    context = conversation.context()
+    assert context[0] == {
+        "role": "system",
+        "content": f"Summary of the conversation so far: {conversation.summary}",
+    }
+    assert conversation.tokens <= 60
+
+
+def test_a_longer_summary_pushes_more_turns_into_it():
+    def summarize(summary, dropped):
+        return words(30)  # big enough to push the next turn out too
+
+    conversation = store(max_tokens=80, summarize=summarize)
+    for i in range(3):
+        conversation.add_turn(f"q{i} " + words(9), f"a{i} " + words(9))
+    # 30 + 4 summary tokens leave room for one 28 token turn only
+    assert roles(conversation.context()) == ["system", "user", "assistant"]
+    assert conversation.context()[1]["content"].startswith("q2")
+    assert conversation.tokens <= 80
+
+
+def test_a_failing_summarize_keeps_the_old_summary():
+    def summarize(summary, dropped):
+        raise RuntimeError("provider down")
+
+    conversation = store(max_tokens=60, summarize=summarize)
+    conversation.summary = "earlier"
+    for i in range(3):
+        conversation.add_turn(f"q{i} " + words(9), f"a{i} " + words(9))
+    assert conversation.summary == "earlier"
+    assert conversation.context()[-1]["content"].startswith("a2")
+
+
+def test_record_adds_only_finished_answers():
+    conversation = store()
+    pieces = conversation.record("Hi", iter(["Hel", "lo"]))
+    assert "".join(pieces) == "Hello"
+    cut_short = conversation.record("Again", iter(["Hel", "lo"]))
+    next(cut_short)
+    cut_short.close()
+    assert roles(conversation.context()) == ["user", "assistant"]
+    assert conversation.context()[1]["content"] == "Hello"
+
+
+def test_clear_forgets_turns_and_summary():
+    conversation = store(system_prompt="Be brief.")
+    conversation.add_turn("Hi", "Hello")
+    conversation.summary = "something"
+    conversation.clear()
+    assert conversation.context() == [{"role": "system", "content": "Be brief."}]
+    assert conversation.tokens == 2 + MESSAGE_OVERHEAD
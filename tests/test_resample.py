@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from resample import WHISPER_SAMPLE_RATE, resample_poly, to_whisper_rate
+
+EDGE = 200  # output samples at each end where the filter sees the zero padding
+
+
+def tone(frequency, sample_rate, seconds=1.0):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return np.sin(2 * np.pi * frequency * t).astype(np.float32)
+
+
+def level_db(audio):
+    """RMS level relative to a full-scale sine."""
+    return 20 * np.log10(np.sqrt(np.mean(np.square(audio))) / np.sqrt(0.5))
+
+
+@pytest.mark.parametrize("sample_rate", [8000, 22050, 44100, 48000])
+@pytest.mark.parametrize("frequency", [440, 1000, 3000])
+def test_passband_tone_comes_through_unchanged(sample_rate, frequency):
+    out = to_whisper_rate(tone(frequency, sample_rate), sample_rate)
+    expected = tone(frequency, WHISPER_SAMPLE_RATE)
+    assert len(out) == len(expected)
+    error = np.abs(out - expected)[EDGE:-EDGE]
+    assert error.max() < 5e-3
+
+
+@pytest.mark.parametrize("sample_rate", [22050, 44100, 48000])
+@pytest.mark.parametrize("frequency", [9000, 12000])
+def test_tones_above_the_output_nyquist_are_rejected(sample_rate, frequency):
+    out = to_whisper_rate(tone(frequency, sample_rate), sample_rate)
+    assert level_db(out[EDGE:-EDGE]) < -50
+
+
+def test_output_length_rounds_up():
+    assert len(resample_poly(np.zeros(441, np.float32), 160, 441)) == 160
+    assert len(resample_poly(np.zeros(1000, np.float32), 160, 441)) == 363
+
+
+def test_equal_rates_pass_the_audio_through():
+    audio = tone(1000, WHISPER_SAMPLE_RATE)
+    assert to_whisper_rate(audio, WHISPER_SAMPLE_RATE) is audio
+    assert resample_poly(audio, 3, 3) is audio
+
+
+def test_chunk_boundaries_do_not_show(monkeypatch):
+    import resample
+
+    audio = tone(1000, 44100, seconds=0.5)
+    whole = to_whisper_rate(audio, 44100)
+    monkeypatch.setattr(resample, "CHUNK", 1000)
+    assert np.allclose(to_whisper_rate(audio, 44100), whole)
@@ -0,0 +1,119 @@
+import response_cache
+from response_cache import ResponseCache, cached_answer, cached_stream, normalize
+
+
+def test_normalize_ignores_case_punctuation_and_spacing():
+    assert normalize("Who are you?") == "who are you"
+    assert normalize("  who   ARE you!!  ") == "who are you"
+    assert normalize("What's the time?") == "what s the time"
+    assert normalize("Wie spät ist es?") == "wie spät ist es"
+
+
+def test_questions_that_normalise_alike_share_an_entry():
+    cache = ResponseCache()
+    cache.put("Who are you?", "An assistant.", latency=1.5)
+    assert cache.get("who are you") == "An assistant."
+    assert cache.get("Who are you, then?") is None
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["misses"]) == (1, 1)
+    assert stats["saved_seconds"] == 1.5
+
+
+def test_namespaces_are_kept_apart():
+    cache = ResponseCache()
+    cache.put("hello", "first", latency=0, namespace="a")
+    assert cache.get("hello", namespace="b") is None
+    assert cache.get("hello", namespace="a") == "first"
+
+
+def test_least_recently_used_entries_go_first():
+    cache = ResponseCache(max_entries=2)
+    cache.put("one", "1", latency=0)
+    cache.put("two", "2", latency=0)
+    cache.get("one")
+    cache.put("three", "3", latency=0)
+    assert cache.get("two") is None
+    assert cache.get("one") == "1"
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl_seconds=60)
+    cache.put("hello", "hi", latency=0)
+    now[0] += 59
+    assert cache.get("hello") == "hi"
+    now[0] += 2
+    assert cache.get("hello") is None
+
+
+def test_semantic_match_above_the_similarity():
+    vectors = {"hello there": [1.0, 0.0], "hi there": [0.95, 0.1], "bye": [0, 1.0]}
+    cache = ResponseCache(embed=vectors.get, similarity=0.9)
+    assert cache.get("Hello there!") is None
+    cache.put("Hello there!", "Hi!", latency=0)
+    assert cache.get("hi there") == "Hi!"
+    assert cache.get("bye") is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def answer(content, history=None):
+    return content
+
+
+def test_key_is_the_question_and_the_function():
+    assert response_cache._key(answer, ("Hi?",), {}) == ("Hi?", "answer")
+    assert response_cache._key(answer, (), {"content": "Hi?"}) == ("Hi?", "answer")
+
+
+def test_key_depends_on_the_history():
+    first = [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}]
+    other = [{"role": "user", "content": "c"}, {"role": "assistant", "content": "d"}]
+    _, plain = response_cache._key(answer, ("Hi?",), {})
+    _, after_first = response_cache._key(answer, ("Hi?", first), {})
+    _, after_first_again = response_cache._key(
+        answer, (), {"content": "Hi?", "history": list(first)}
+    )
+    _, after_other = response_cache._key(answer, ("Hi?", other), {})
+    assert after_first == after_first_again
+    assert len({plain, after_first, after_other}) == 3
+    # An empty history is the same as none
+    assert response_cache._key(answer, ("Hi?", []), {})[1] == plain
+
+
+def test_cached_answer_calls_the_function_once_per_question():
+    calls = []
+
+    @cached_answer(ResponseCache())
+    def ask(content, history=None):
+        calls.append(content)
+        return f"answer to {content}"
+
+    assert ask("Who are you?") == "answer to Who are you?"
+    assert ask("who are you") == "answer to Who are you?"
+    assert ask("who are you", history=[{"role": "user", "content": "x"}]) == (
+        "answer to who are you"
+    )
+    assert calls == ["Who are you?", "who are you"]
+
+
+def test_cached_stream_stores_only_complete_answers():
+    cache = ResponseCache()
+
+    @cached_stream(cache)
+    def stream(content, history=None):
+        yield "Hello"
+        yield " world"
+
+    pieces = stream("hi")
+    assert next(pieces) == "Hello"
+    pieces.close()  # the listener stopped half way
+    assert cache.get("hi", "stream") is None
+
+    assert list(stream("hi")) == ["Hello", " world"]
+    assert list(stream("hi")) == ["Hello world"]
+
+
+def test_a_cache_of_none_leaves_the_function_alone():
+    assert cached_answer(None)(answer) is answer
+    assert cached_stream(None)(answer) is answer
@@ -0,0 +1,124 @@
+import threading
+import time
+import pytest
+import router
+from router import Router, abort_on_cancel
+
+
+def answering(*pieces, delay=0.0):
+    """Fake provider: waits `delay` seconds, then streams `pieces`."""
+    calls = []
+
+    def stream(content, history=None):
+        calls.append(content)
+        time.sleep(delay)
+        yield from pieces
+
+    stream.calls = calls
+    return stream
+
+
+def failing(message="down"):
+    def stream(content, history=None):
+        raise RuntimeError(message)
+        yield
+
+    return stream
+
+
+def test_the_first_provider_answers():
+    fast, other = answering("Hello", " there"), answering("Other")
+    llm = Router({"fast": fast, "other": other})
+    assert list(llm.stream("Hi")) == ["Hello", " there"]
+    assert other.calls == []
+    assert llm.summary()["fast"]["wins"] == 1
+
+
+def test_fails_over_to_the_next_provider():
+    backup = answering("From the backup")
+    llm = Router({"broken": failing(), "backup": backup})
+    assert llm.query("Hi") == "From the backup"
+    summary = llm.summary()
+    assert summary["broken"]["error_rate"] == 1.0
+    assert summary["backup"]["wins"] == 1
+
+
+def test_raises_when_every_provider_fails():
+    llm = Router({"a": failing("a down"), "b": failing("b down")})
+    with pytest.raises(RuntimeError, match="b down"):
+        llm.query("Hi")
+
+
+def test_a_slow_provider_is_hedged_and_its_answer_dropped():
+    slow, fast = answering("Slow", delay=1.0), answering("Fast")
+    llm = Router({"slow": slow, "fast": fast}, hedge_seconds=0.05)
+    started = time.perf_counter()
+    assert llm.query("Hi") == "Fast"
+    assert time.perf_counter() - started < 0.5
+    summary = llm.summary()
+    assert summary["fast"]["hedges"] == 1
+    assert summary["fast"]["wins"] == 1
+    assert summary["slow"]["cancelled"] == 1
+    # The loser's cut-off time is no first-token timing
+    assert summary["slow"]["p50_ms"] is None
+
+
+def test_no_hedge_when_disabled():
+    slow, fast = answering("Slow", delay=0.2), answering("Fast")
+    llm = Router({"slow": slow, "fast": fast}, hedge=False, hedge_seconds=0.01)
+    assert llm.query("Hi") == "Slow"
+    assert fast.calls == []
+
+
+def test_the_faster_provider_is_ranked_first():
+    slow, fast = answering("Slow", delay=0.2), answering("Fast")
+    llm = Router({"slow": slow, "fast": fast}, hedge_seconds=0.05)
+    llm.query("Hi")
+    assert llm.ranked() == ["fast", "slow"]
+    assert llm.query("Hi again") == "Fast"
+    assert slow.calls == ["Hi"]
+
+
+def test_a_provider_that_keeps_failing_cools_down(monkeypatch):
+    monkeypatch.setattr(router, "FAILURES_BEFORE_COOLDOWN", 2)
+    llm = Router({"broken": failing(), "backup": answering("ok")})
+    # An untried provider goes first, a failed one is ranked last at once
+    llm.query("Hi")
+    assert llm.ranked() == ["backup", "broken"]
+    llm.stats["backup"].first_token.extend([10.0] * 5)  # make it look slow
+    llm.stats["broken"].errors.clear()
+    llm.query("Hi")
+    assert llm.summary()["broken"]["down"]
+    assert llm.ranked()[-1] == "broken"
+
+
+def test_cancel_aborts_a_loser_waiting_for_its_first_token():
+    aborted = threading.Event()
+
+    def stuck(content, history=None):
+        # Like a response blocked on its socket until shut_down is called
+        with abort_on_cancel(aborted.set):
+            if not aborted.wait(5):
+                yield "too late"
+
+    llm = Router({"stuck": stuck, "fast": answering("Fast")}, hedge_seconds=0.05)
+    assert llm.query("Hi") == "Fast"
+    assert aborted.wait(1)
+
+
+def test_the_abort_is_dropped_once_its_block_is_left():
+    aborts = []
+
+    def provider(content, history=None):
+        with abort_on_cancel(lambda: aborts.append("aborted")):
+            yield "Hello"
+        yield " there"
+
+    llm = Router({"only": provider})
+    assert llm.query("Hi") == "Hello there"
+    assert aborts == []
+
+
+def test_abort_on_cancel_outside_the_router_does_nothing():
+    with abort_on_cancel(lambda: pytest.fail("called")):
+        pass
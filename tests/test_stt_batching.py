@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import numpy as np
+import pytest
+from batching import MicroBatcher
+from stt_backends import N_SAMPLES
+from stt_batching import BatchedTranscriber
+
+SAMPLE_RATE = 16000
+
+
+class FakeBackend:
+    """Records its batches; a segment's text is its length in samples."""
+
+    name = "fake"
+
+    def __init__(self, language="en", delay=0.0):
+        self.language = language
+        self.delay = delay
+        self.batches = []  # (segment lengths, language)
+        self.unbatched = []
+
+    def transcribe_batch(self, segments, language=None):
+        self.batches.append(([len(s) for s in segments], language))
+        time.sleep(self.delay)
+        return [{"text": f"<{len(s)}>", "language": language} for s in segments]
+
+    def transcribe(self, audio, language=None, **options):
+        self.unbatched.append((len(audio), language, options))
+        return {"text": "timed", "segments": [], "language": language}
+
+
+def audio(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def test_concurrent_requests_share_a_batch():
+    backend = FakeBackend()
+    model = BatchedTranscriber(backend, max_batch=8, max_wait_ms=200)
+    start = threading.Barrier(4)
+
+    def transcribe(seconds):
+        start.wait()
+        return model.transcribe(audio(seconds), without_timestamps=True)["text"]
+
+    with ThreadPoolExecutor(4) as pool:
+        texts = list(pool.map(transcribe, [1, 2, 3, 4]))
+
+    assert texts == [f"<{n * SAMPLE_RATE}>" for n in (1, 2, 3, 4)]
+    assert len(backend.batches) == 1
+    assert sorted(backend.batches[0][0]) == [n * SAMPLE_RATE for n in (1, 2, 3, 4)]
+    stats = model.stats()
+    assert stats["segments"] == 4
+    assert stats["mean_batch_size"] == 4.0
+    assert stats["occupancy"] == 0.5
+
+
+def test_long_audio_is_cut_into_30_second_segments():
+    backend = FakeBackend()
+    model = BatchedTranscriber(backend, max_wait_ms=1)
+    result = model.transcribe(audio(70), without_timestamps=True)
+    tail = 70 * SAMPLE_RATE - 2 * N_SAMPLES
+    assert result["text"] == f"<{N_SAMPLES}><{N_SAMPLES}><{tail}>"
+    assert [(s["start"], s["end"]) for s in result["segments"]] == [
+        (0.0, 30.0),
+        (30.0, 60.0),
+        (60.0, 70.0),
+    ]
+    assert result["language"] == "en"
+
+
+def test_batch_size_is_capped():
+    backend = FakeBackend()
+    model = BatchedTranscriber(backend, max_batch=2, max_wait_ms=50)
+    model.transcribe(audio(150), without_timestamps=True)
+    assert [len(sizes) for sizes, _ in backend.batches] == [2, 2, 1]
+
+
+def test_languages_are_decoded_apart():
+    backend = FakeBackend(language=None)
+    model = BatchedTranscriber(backend, max_wait_ms=200)
+    start = threading.Barrier(3)
+
+    def transcribe(language):
+        start.wait()
+        return model.transcribe(audio(1), language, without_timestamps=True)
+
+    with ThreadPoolExecutor(3) as pool:
+        results = list(pool.map(transcribe, ["en", "it", "auto"]))
+
+    assert [r["language"] for r in results] == ["en", "it", None]
+    assert sorted(map(str, (language for _, language in backend.batches))) == [
+        "None",
+        "en",
+        "it",
+    ]
+
+
+def test_calls_that_need_timestamps_go_to_the_backend():
+    backend = FakeBackend()
+    model = BatchedTranscriber(backend)
+    assert model.transcribe(audio(1), temperature=0)["text"] == "timed"
+    assert backend.unbatched == [(SAMPLE_RATE, "en", {"temperature": 0})]
+    assert backend.batches == []
+
+
+def test_empty_audio_never_reaches_the_model():
+    backend = FakeBackend()
+    model = BatchedTranscriber(backend)
+    for without_timestamps in (True, False):
+        result = model.transcribe(audio(0), without_timestamps=without_timestamps)
+        assert result == {"text": "", "segments": [], "language": "en"}
+    assert backend.batches == backend.unbatched == []
+
+
+def test_micro_batcher_waits_at_most_max_wait_for_a_batch():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(items) or items, 8, 20)
+    started = time.perf_counter()
+    assert batcher.submit("one").result(timeout=1) == "one"
+    assert time.perf_counter() - started < 0.5
+    assert batches == [["one"]]
+
+
+def test_micro_batcher_fails_every_future_of_a_failed_batch():
+    def run_batch(items):
+        raise ValueError("model crashed")
+
+    batcher = MicroBatcher(run_batch, max_batch=4, max_wait_ms=100)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError, match="model crashed"):
+            future.result(timeout=1)
+    assert batcher.batches == 1
+    assert batcher.mean_batch_size == 3.0
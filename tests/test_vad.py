@@ -0,0 +1,79 @@
+import numpy as np
+from vad import EnergyVAD
+
+SAMPLE_RATE = 16000
+BLOCK = 512  # frames per sounddevice callback
+
+
+def noise(seconds, level_db, seed=0):
+    rng = np.random.default_rng(seed)
+    scale = 10 ** (level_db / 20)
+    return (scale * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+
+def feed(vad, audio, block=BLOCK):
+    """Feed `audio` block by block; the sample where it endpointed, or None."""
+    for start in range(0, len(audio), block):
+        if vad.process(audio[start : start + block]):
+            return start + block
+    return None
+
+
+def test_endpoints_after_the_silence_that_follows_speech():
+    vad = EnergyVAD(SAMPLE_RATE, silence_seconds=1.0)
+    audio = np.concatenate([noise(1, -70), noise(2, -20), noise(2, -70)])
+    endpoint = feed(vad, audio)
+    assert endpoint is not None
+    # One second of silence after the speech ended at 3 s, give or take a block
+    assert 4 * SAMPLE_RATE <= endpoint <= 4 * SAMPLE_RATE + 2 * BLOCK
+
+
+def test_speech_bounds_are_padded():
+    vad = EnergyVAD(SAMPLE_RATE, padding_seconds=0.2)
+    audio = np.concatenate([noise(1, -70), noise(2, -20), noise(1.5, -70)])
+    vad.process(audio)
+    start, end = vad.speech_bounds(len(audio))
+    padding = 0.2 * SAMPLE_RATE
+    assert abs(start - (SAMPLE_RATE - padding)) <= vad.frame
+    assert abs(end - (3 * SAMPLE_RATE + padding)) <= vad.frame
+    # Never past the audio there is
+    assert vad.speech_bounds(3 * SAMPLE_RATE)[1] == 3 * SAMPLE_RATE
+
+
+def test_silence_alone_never_endpoints():
+    vad = EnergyVAD(SAMPLE_RATE)
+    assert feed(vad, noise(5, -70)) is None
+    assert vad.speech_bounds() is None
+
+
+def test_short_pause_does_not_endpoint():
+    vad = EnergyVAD(SAMPLE_RATE, silence_seconds=1.0)
+    audio = np.concatenate([noise(1, -20), noise(0.5, -70, seed=1), noise(1, -20)])
+    assert feed(vad, audio) is None
+
+
+def test_steady_loud_noise_eventually_endpoints():
+    # A fan above threshold_db: the floor follows it up and the take ends
+    vad = EnergyVAD(SAMPLE_RATE)
+    endpoint = feed(vad, noise(60, -30))
+    assert endpoint is not None
+    assert endpoint < 30 * SAMPLE_RATE
+
+
+def test_block_size_does_not_change_the_result():
+    audio = np.concatenate([noise(0.5, -70), noise(1, -20), noise(1.5, -70)])
+    results = []
+    for block in (100, 480, 512, 4096, len(audio)):
+        vad = EnergyVAD(SAMPLE_RATE)
+        feed(vad, audio, block)
+        results.append((vad.endpointed, vad.speech_bounds(len(audio))))
+    assert all(result == results[0] for result in results)
+
+
+def test_reset_starts_a_new_take():
+    vad = EnergyVAD(SAMPLE_RATE)
+    feed(vad, np.concatenate([noise(1, -20), noise(1.5, -70)]))
+    assert vad.endpointed
+    vad.reset()
+    assert not vad.endpointed
+    assert vad.speech_bounds() is None
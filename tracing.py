@@ -0,0 +1,220 @@
+"""
+Lightweight per-stage tracing.
+
+A span times one stage of one turn (record, stt, llm, tts, ...) and carries
+numbers about it such as audio seconds, tokens or bytes. Every finished
+span is appended to a JSONL file and kept in a rolling window per stage,
+from which p50/p95/p99 latencies are computed. `prometheus()` renders
+them, plus running totals, in the Prometheus text format; `instrument`
+adds that as GET /metrics to a FastAPI app and times every request.
+
+    tracer = get_tracer()
+    with tracer.span("stt", trace=turn.number, audio_seconds=4.2) as span:
+        text = transcribe(...)
+        span.set(chars=len(text))
+"""
+
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+import json
+import os
+import threading
+import time
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Span:
+    def __init__(self, tracer, name, trace=None, **attrs):
+        self.tracer = tracer
+        self.name = name
+        self.trace = trace
+        self.attrs = attrs
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self, error=None):
+        if self.duration is not None:
+            return  # already ended
+        self.duration = time.perf_counter() - self.started
+        if error is not None:
+            self.attrs["error"] = f"{type(error).__name__}: {error}"
+        self.tracer.record(self)
+
+
+class Tracer:
+    """Collects spans; `window` is how many recent spans per stage are kept."""
+
+    def __init__(self, path=None, window=1000):
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts = defaultdict(int)
+        self._sums = defaultdict(float)
+        self._totals = defaultdict(float)  # (stage, attribute) -> sum
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def start_span(self, name, trace=None, **attrs):
+        """A span for work that doesn't fit a `with` block; call `.end()`."""
+        return Span(self, name, trace, **attrs)
+
+    @contextmanager
+    def span(self, name, trace=None, **attrs):
+        span = Span(self, name, trace, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(error=e)
+            raise
+        span.end()
+
+    def add(self, name, duration, trace=None, **attrs):
+        """Record a span whose duration was measured elsewhere."""
+        span = Span(self, name, trace, **attrs)
+        span.timestamp -= duration
+        span.duration = duration
+        self.record(span)
+
+    def traced(self, name, items, trace=None, size=None, unit="items", **attrs):
+        """
+        Pass `items` through, timing the whole iteration as one span. The
+        span gets the time to the first item, the number of items and, with
+        `size`, the sum of `size(item)` under `unit` (e.g. bytes).
+        """
+        span = self.start_span(name, trace, **attrs)
+        count = total = 0
+        error = None
+        try:
+            for item in items:
+                if count == 0:
+                    span.set(first_item_seconds=time.perf_counter() - span.started)
+                count += 1
+                if size is not None:
+                    total += size(item)
+                yield item
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            span.set(count=count, **({unit: total} if size is not None else {}))
+            span.end(error=error)
+
+    def record(self, span):
+        line = {
+            "trace": span.trace,
+            "span": span.name,
+            "timestamp": round(span.timestamp, 3),
+            "duration_ms": round(span.duration * 1000, 2),
+            **span.attrs,
+        }
+        with self._lock:
+            self._durations[span.name].append(span.duration)
+            self._counts[span.name] += 1
+            self._sums[span.name] += span.duration
+            for key, value in span.attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self._totals[span.name, key] += value
+            if self._file is not None:
+                self._file.write(json.dumps(line, default=str) + "\n")
+                self._file.flush()
+
+    def percentiles(self, name):
+        """p50/p95/p99 in seconds over the stage's recent spans."""
+        return {f"p{int(q * 100)}": v for q, v in self._quantiles(name)}
+
+    def _quantiles(self, name):
+        with self._lock:
+            durations = sorted(self._durations[name])
+        if not durations:
+            return []
+        last = len(durations) - 1
+        return [(q, durations[min(int(q * len(durations)), last)]) for q in QUANTILES]
+
+    def summary(self):
+        """Latency percentiles and span count per stage, in milliseconds."""
+        return {
+            name: {
+                **{k: round(v * 1000, 1) for k, v in self.percentiles(name).items()},
+                "count": self._counts[name],
+            }
+            for name in list(self._durations)
+        }
+
+    def prometheus(self):
+        lines = [
+            "# HELP stage_seconds Stage latency over the most recent spans.",
+            "# TYPE stage_seconds summary",
+        ]
+        for name in list(self._durations):
+            for q, value in self._quantiles(name):
+                lines.append(f'stage_seconds{{stage="{name}",quantile="{q}"}} {value}')
+            lines.append(f'stage_seconds_sum{{stage="{name}"}} {self._sums[name]}')
+            lines.append(f'stage_seconds_count{{stage="{name}"}} {self._counts[name]}')
+        lines += [
+            "# HELP stage_attribute_total Running total of a numeric span attribute.",
+            "# TYPE stage_attribute_total counter",
+        ]
+        for (name, key), value in list(self._totals.items()):
+            lines.append(
+                f'stage_attribute_total{{stage="{name}",attribute="{key}"}} {value}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+@lru_cache(maxsize=None)
+def get_tracer():
+    """The process-wide tracer, exporting to `settings.trace_file`."""
+    from providers import get_config
+
+    settings = get_config()["settings"]
+    return Tracer(
+        path=settings.get("trace_file", "transcriptions/trace.jsonl"),
+        window=settings.get("trace_window", 1000),
+    )
+
+
+def instrument(app, tracer=None):
+    """Time every request of a FastAPI app and serve GET /metrics."""
+    from fastapi.responses import PlainTextResponse
+
+    tracer = tracer or get_tracer()
+
+    def record(request, started, **attrs):
+        # One stage per route template, so /items/1 and /items/2 share it;
+        # unmatched paths and the scrapes of /metrics are left out
+        route = request.scope.get("route")
+        if route is None or route.path == "/metrics":
+            return
+        duration = time.perf_counter() - started
+        tracer.add(f"{request.method} {route.path}", duration, **attrs)
+
+    @app.middleware("http")
+    async def trace_requests(request, call_next):
+        started = time.perf_counter()
+        try:
+            response = await call_next(request)
+        except Exception as e:
+            record(request, started, error=f"{type(e).__name__}: {e}")
+            raise
+        # For streamed responses this is the time to the first byte
+        attrs = {"status": str(response.status_code)}  # a label, not a quantity
+        length = response.headers.get("content-length")
+        if length is not None:
+            attrs["bytes"] = int(length)
+        record(request, started, **attrs)
+        return response
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return tracer.prometheus()
+
+    return tracer
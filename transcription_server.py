@@ -0,0 +1,74 @@
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from contextlib import nullcontext
+import threading
+import numpy as np
+import uvicorn
+import yaml
+from stt_backends import load_from_config
+import stt_batching
+from tracing import instrument
+
+# Load the YAML config
+with open("config.yaml", "r") as file:
+    config = yaml.safe_load(file)
+
+WHISPER_MODEL = config["settings"].get("whisper_model", "base")
+LANGUAGE = config["settings"].get("language")
+
+app = FastAPI()
+tracer = instrument(app)  # request spans and GET /metrics
+
+# Loaded once and kept warm for every client
+MODEL = stt_batching.from_config(load_from_config())
+BATCHED = isinstance(MODEL, stt_batching.BatchedTranscriber)
+# Concurrent requests are batched together, or else take turns on the model
+model_lock = nullcontext() if BATCHED else threading.Lock()
+
+
+def run_model(audio, language, without_timestamps):
+    with model_lock, tracer.span("stt", audio_seconds=len(audio) / 16000):
+        # Without a language in the request, the configured one is used
+        return MODEL.transcribe(
+            audio, language=language, without_timestamps=without_timestamps
+        )
+
+
+@app.post("/transcribe")
+async def transcribe(
+    request: Request, language: str = None, without_timestamps: bool = False
+):
+    """
+    Accepts the raw bytes of a mono float32 array sampled at 16 kHz
+    (Content-Type: application/octet-stream). Returns a JSON object with
+    the text and the segments, as `whisper.transcribe` would, whichever
+    backend is configured. Only `without_timestamps=true` requests are
+    batched; the segments then have no real start and end times.
+    """
+    body = await request.body()
+    audio = np.frombuffer(body, dtype=np.float32)
+    if len(audio) == 0:
+        return {"text": "", "segments": [], "language": language or LANGUAGE}
+
+    result = await run_in_threadpool(run_model, audio, language, without_timestamps)
+    segments = [
+        {"start": s["start"], "end": s["end"], "text": s["text"]}
+        for s in result["segments"]
+    ]
+    return {
+        "text": result["text"],
+        "segments": segments,
+        "language": result["language"],
+    }
+
+
+@app.get("/health")
+def health():
+    health = {"backend": MODEL.name, "model": WHISPER_MODEL}
+    if BATCHED:
+        health["batching"] = MODEL.stats()
+    return health
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=8001)
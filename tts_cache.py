@@ -0,0 +1,121 @@
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+import threading
+
+
+class AudioCache:
+    """
+    Content-addressed cache of synthesised speech, on disk and in memory.
+
+    Entries are keyed by a hash of everything that changes the audio
+    (text, voice, model, output format). The disk part is bounded by
+    `max_bytes` and the in-memory copy of recent entries by `memory_bytes`;
+    both evict the least recently used entries first. Files are written to
+    a temporary name and renamed into place, so a crash never leaves a
+    truncated clip behind.
+    """
+
+    def __init__(self, directory, max_bytes=200 << 20, memory_bytes=20 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_size = 0
+        self._disk = OrderedDict()  # key -> size, oldest first
+        self._disk_size = 0
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)  # left over from an interrupted write
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_size += size
+
+    @staticmethod
+    def key(text, voice_id, model_id, output_format):
+        fields = "\0".join([text.strip(), voice_id, model_id, output_format])
+        return hashlib.sha256(fields.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Cached bytes for `key`, or None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            elif key in self._disk:
+                try:
+                    with open(self._path(key), "rb") as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    self._forget(key)
+                else:
+                    self._remember(key, data)
+
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if key in self._disk:
+                self._disk.move_to_end(key)
+                os.utime(self._path(key))
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+
+            self._forget(key)
+            self._disk[key] = len(data)
+            self._disk_size += len(data)
+            self._remember(key, data)
+            while self._disk_size > self.max_bytes and len(self._disk) > 1:
+                oldest = next(iter(self._disk))
+                self._forget(oldest)
+                try:
+                    os.remove(self._path(oldest))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._disk),
+            "bytes": self._disk_size,
+        }
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, dropped = self._memory.popitem(last=False)
+            self._memory_size -= len(dropped)
+
+    def _forget(self, key):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_size -= size
+        data = self._memory.pop(key, None)
+        if data is not None:
+            self._memory_size -= len(data)
@@ -0,0 +1,126 @@
+import queue
+import threading
+import time
+import traceback
+
+
+class TurnCancelled(Exception):
+    """Raised inside a stage once its turn has been cancelled."""
+
+
+class Turn:
+    """One record -> answer round trip travelling through the executor."""
+
+    def __init__(self, number):
+        self.number = number
+        self.cancelled = threading.Event()
+        self.started = time.perf_counter()
+        self.marks = {}  # name -> seconds since the turn was submitted
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def mark(self, name):
+        """Record how long after submission `name` happened."""
+        self.marks[name] = time.perf_counter() - self.started
+
+    def check(self):
+        """Long-running stages call this to bail out early once cancelled."""
+        if self.cancelled.is_set():
+            raise TurnCancelled()
+
+
+class TurnExecutor:
+    """
+    Run each turn through a list of (label, function) stages off the Tk thread.
+
+    Every stage has its own worker thread and the stages are chained by
+    queues, so while one turn is being spoken the next one can already be
+    transcribed. A stage function gets `(turn, value)` and returns the
+    value for the next stage. A stage may be a (label, function, drop)
+    triple: `drop(value)` is then called with the value a cancelled turn
+    was carrying when it reached that stage, which never ran, so the value
+    can release what it holds.
+
+    Progress is delivered to `on_progress(turn, label)` on the Tk thread by
+    polling with `root.after`; `label` is the stage label, or "Done",
+    "Cancelled" or "Failed: ..." when the turn leaves the executor.
+    """
+
+    def __init__(self, root, stages, on_progress, poll_ms=50):
+        self.root = root
+        self.on_progress = on_progress
+        self.poll_ms = poll_ms
+        self._progress = queue.Queue()
+        self._inboxes = [queue.Queue() for _ in stages]
+        self._in_flight = []
+        self._lock = threading.Lock()
+        self._count = 0
+
+        for index, (label, fn, *drop) in enumerate(stages):
+            threading.Thread(
+                target=self._run_stage,
+                args=(index, label, fn, drop[0] if drop else None),
+                daemon=True,
+            ).start()
+        self.root.after(self.poll_ms, self._drain)
+
+    @property
+    def busy(self):
+        return bool(self._in_flight)
+
+    def submit(self, value):
+        """Queue a new turn whose first stage will receive `value`."""
+        with self._lock:
+            self._count += 1
+            turn = Turn(self._count)
+            self._in_flight.append(turn)
+        self._inboxes[0].put((turn, value))
+        return turn
+
+    def cancel_all(self):
+        """Cancel every turn still being processed."""
+        with self._lock:
+            for turn in self._in_flight:
+                turn.cancel()
+
+    def _run_stage(self, index, label, fn, drop):
+        inbox = self._inboxes[index]
+        while True:
+            turn, value = inbox.get()
+            if turn.cancelled.is_set():
+                if drop is not None:
+                    drop(value)
+                self._finish(turn, "Cancelled")
+                continue
+            try:
+                self._progress.put((turn, label))
+                value = fn(turn, value)
+            except TurnCancelled:
+                self._finish(turn, "Cancelled")
+                continue
+            except Exception as e:
+                traceback.print_exc()
+                self._finish(turn, f"Failed: {e}")
+                continue
+
+            # Passed on even if cancelled meanwhile: the next stage drops it
+            if index + 1 < len(self._inboxes):
+                self._inboxes[index + 1].put((turn, value))
+            else:
+                self._finish(turn, "Cancelled" if turn.cancelled.is_set() else "Done")
+
+    def _finish(self, turn, label):
+        turn.mark("total")
+        with self._lock:
+            self._in_flight.remove(turn)
+        self._progress.put((turn, label))
+
+    def _drain(self):
+        while True:
+            try:
+                turn, label = self._progress.get_nowait()
+            except queue.Empty:
+                break
+            self.on_progress(turn, label)
+        self.root.after(self.poll_ms, self._drain)
@@ -0,0 +1,99 @@
+import numpy as np
+
+
+class EnergyVAD:
+    """
+    Energy-based voice activity detector with end-pointing.
+
+    Audio is cut into `frame_ms` frames. A frame counts as speech when its
+    RMS level is above both `threshold_db` (dBFS) and the tracked noise
+    floor plus `margin_db`. Once speech has been heard, `silence_seconds`
+    of consecutive non-speech frames mark the end of the utterance.
+
+    The floor also creeps up during speech, much more slowly, so steady
+    noise louder than `threshold_db` (a fan, traffic) stops counting as
+    speech after some seconds instead of never letting the take end.
+    """
+
+    def __init__(
+        self,
+        sample_rate,
+        frame_ms=30,
+        threshold_db=-45.0,
+        margin_db=10.0,
+        silence_seconds=1.0,
+        padding_seconds=0.2,
+    ):
+        self.sample_rate = sample_rate
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.silence_frames = int(silence_seconds * 1000 / frame_ms)
+        self.padding = int(padding_seconds * sample_rate)
+        self._carry = np.zeros(self.frame, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self._carry_len = 0
+        self.noise_floor_db = self.threshold_db - self.margin_db
+        self.samples_seen = 0
+        self.speech_start = None
+        self.speech_end = None
+        self.silent_frames = 0
+        self.endpointed = False
+
+    def process(self, block):
+        """Feed mono samples; returns True once the utterance has ended."""
+        offset = 0
+        if self._carry_len:
+            offset = min(len(block), self.frame - self._carry_len)
+            self._carry[self._carry_len : self._carry_len + offset] = block[:offset]
+            self._carry_len += offset
+            if self._carry_len < self.frame:
+                return self.endpointed
+            self._frame(self._level_db(self._carry[None, :])[0])
+            self._carry_len = 0
+
+        n = (len(block) - offset) // self.frame
+        if n:
+            frames = block[offset : offset + n * self.frame].reshape(n, self.frame)
+            for level in self._level_db(frames):
+                self._frame(level)
+
+        rest = block[offset + n * self.frame :]
+        self._carry[: len(rest)] = rest
+        self._carry_len = len(rest)
+        return self.endpointed
+
+    def speech_bounds(self, total=None):
+        """(start, end) sample range of the speech plus padding, or None."""
+        if self.speech_start is None:
+            return None
+        total = self.samples_seen + self._carry_len if total is None else total
+        start = max(0, self.speech_start - self.padding)
+        end = min(total, self.speech_end + self.padding)
+        return start, end
+
+    def _frame(self, level_db):
+        start = self.samples_seen
+        self.samples_seen += self.frame
+        if level_db > max(self.threshold_db, self.noise_floor_db + self.margin_db):
+            if self.speech_start is None:
+                self.speech_start = start
+            self.speech_end = self.samples_seen
+            self.silent_frames = 0
+            # Pauses pull the floor back down long before real speech
+            # catches up with it
+            self.noise_floor_db += 0.002 * (level_db - self.noise_floor_db)
+        else:
+            # Slowly follow the background level on non-speech frames
+            self.noise_floor_db += 0.05 * (level_db - self.noise_floor_db)
+            if self.speech_start is not None:
+                self.silent_frames += 1
+                if self.silent_frames >= self.silence_frames:
+                    self.endpointed = True
+
+    @staticmethod
+    def _level_db(frames):
+        power = np.mean(np.square(frames, dtype=np.float32), axis=1)
+        return 10 * np.log10(power + 1e-10)
@@ -0,0 +1,341 @@
+"""
+WebSocket voice server: many people talking to the assistant at once.
+
+Each connection to /session is one user with their own recording buffer,
+end-pointing VAD, conversation memory and turn counter; nothing is shared
+between sessions but the models and clients. Speech-to-text runs on a
+shared pool of worker processes, each with the configured backend loaded
+once, so sessions scale with the cores of the box instead of queueing on
+one model behind the GIL. With `stt_batch_size` above 1 there is instead
+one model in this process, and utterances from all sessions are batched
+into shared encoder passes (stt_batching.py).
+
+Protocol, client -> server:
+    binary   mono float32 PCM at `sample_rate` (query parameter, default
+             settings.sample_rate), in frames of any size
+    text     {"type": "end"}     the utterance is over (without waiting
+                                 for the VAD to hear the silence)
+             {"type": "cancel"}  drop the turns in progress
+
+Server -> client:
+    text     {"type": "ready", "session", "audio_rate", "audio_format"}
+             {"type": "transcript", "turn", "text"}
+             {"type": "sentence", "turn", "text"}   as the answer streams
+             {"type": "turn_end", "turn", "timings_ms"}
+             {"type": "error", "turn", "message"}
+    binary   TTS audio for the latest sentence, 16-bit mono PCM at
+             `audio_rate`
+
+`?answer=false` only transcribes; `?speak=false` answers without audio;
+`?endpointing=false` ends turns only on "end" (and at MAX_TURN_SECONDS),
+not when the VAD hears a pause.
+Recordings and the last answer are kept per session under
+transcriptions/sessions/<session>/.
+
+Serving WebSockets needs uvicorn's optional `websockets` package
+(pip install websockets), as does the load test bench_voice_server.py.
+
+Started by voice_server.py, which keeps the main script small: the
+speech-to-text workers are spawned, and spawning re-runs the main script
+in every worker.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import numpy as np
+from audio_buffer import CaptureBuffer, write_wav
+import batch_transcribe
+import conversation
+import stt_batching
+import player
+from providers import get_config
+from resample import to_whisper_rate
+from router import get_router, stream_answer
+from request_from_provider_hugging_face import saved, summarize_conversation
+from sentence_stream import background_iter, background_sentences
+from stt_backends import DEFAULT_BACKEND
+from tracing import instrument
+from vad import EnergyVAD
+
+# --- Settings ---
+settings = get_config()["settings"]
+SAMPLE_RATE = settings.get("sample_rate", 16000)
+ARCHIVE_WAV = settings.get("archive_wav", True)
+VAD_SILENCE_SECONDS = settings.get("vad_silence_seconds", 1.0)
+VAD_THRESHOLD_DB = settings.get("vad_threshold_db", -45.0)
+STT_WORKERS = settings.get("voice_server_workers") or os.cpu_count()
+MAX_SESSIONS = settings.get("voice_server_max_sessions", 64)
+STT_BATCH_SIZE = settings.get("stt_batch_size", 1)
+MAX_TURN_SECONDS = 60  # an utterance is cut here even if the VAD hears no pause
+SESSIONS_DIR = "transcriptions/sessions"
+
+stt_pool = None
+batched_model = None
+sessions = {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global stt_pool, batched_model
+    if STT_BATCH_SIZE > 1:
+        # One model in this process; concurrent sessions share its batches
+        from stt_backends import load_from_config
+
+        batched_model = stt_batching.from_config(load_from_config())
+        print(f"Batched speech-to-text, up to {STT_BATCH_SIZE} segments per pass")
+        # Load the weights now rather than in the first users' turns
+        silence = np.zeros(16000, dtype=np.float32)
+        await asyncio.to_thread(
+            batched_model.transcribe, silence, without_timestamps=True
+        )
+        yield
+        return
+    # Spawned, not forked: this process already runs threads. The workers
+    # import batch_transcribe and the thin voice_server.py, not this module.
+    stt_pool = ProcessPoolExecutor(
+        STT_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=batch_transcribe.load_model,
+        initargs=(
+            settings.get("stt_backend", DEFAULT_BACKEND),
+            settings.get("whisper_model", "base"),
+            settings.get("language"),
+            settings.get("stt_threads", 1),
+        ),
+    )
+    # Load the models now rather than in the first users' turns
+    loop = asyncio.get_running_loop()
+    silence = np.zeros(16000, dtype=np.float32)
+    await asyncio.gather(
+        *(
+            loop.run_in_executor(stt_pool, batch_transcribe.transcribe_array, silence)
+            for _ in range(STT_WORKERS)
+        )
+    )
+    print(f"{STT_WORKERS} speech-to-text workers ready")
+    yield
+    stt_pool.shutdown(cancel_futures=True)
+
+
+app = FastAPI(lifespan=lifespan)
+tracer = instrument(app)  # request spans and GET /metrics
+
+
+class Session:
+    """Everything one connected user has that others must not see."""
+
+    def __init__(self, websocket, sample_rate, answer, speak, endpointing=True):
+        self.id = uuid.uuid4().hex[:12]
+        self.websocket = websocket
+        self.sample_rate = sample_rate
+        self.answer = answer
+        self.speak = speak
+        self.endpointing = endpointing
+        self.buffer = CaptureBuffer(sample_rate, initial_seconds=10)
+        self.vad = EnergyVAD(
+            sample_rate,
+            threshold_db=VAD_THRESHOLD_DB,
+            silence_seconds=VAD_SILENCE_SECONDS,
+        )
+        self.conversation = conversation.from_config(summarize=summarize_conversation)
+        self.turns = asyncio.Queue()  # utterances waiting to be answered
+        self.turn_number = 0
+        self.cancelled = threading.Event()  # the turn in progress
+        self._send_lock = asyncio.Lock()
+
+    def feed(self, block):
+        """Add samples; returns the utterance once it has ended, else None."""
+        self.buffer.write(block)
+        too_long = len(self.buffer) > MAX_TURN_SECONDS * self.sample_rate
+        # The VAD always runs: `take` trims the utterance with it
+        endpointed = self.vad.process(block)
+        if (endpointed and self.endpointing) or too_long:
+            return self.take()
+        return None
+
+    def take(self):
+        """The speech recorded since the last take; empty if there was none."""
+        bounds = self.vad.speech_bounds(len(self.buffer)) or (0, 0)
+        audio = self.buffer.mono()[slice(*bounds)].copy()
+        self.buffer.clear()
+        self.vad.reset()
+        return audio
+
+    def cancel(self):
+        while not self.turns.empty():
+            self.turns.get_nowait()
+        self.cancelled.set()
+
+    async def send(self, message):
+        async with self._send_lock:
+            if isinstance(message, bytes):
+                await self.websocket.send_bytes(message)
+            else:
+                await self.websocket.send_text(json.dumps(message))
+
+
+async def transcribe(audio, sample_rate):
+    """Resampling included, off the event loop."""
+    if batched_model is not None:
+        return await asyncio.to_thread(transcribe_batched, audio, sample_rate)
+    return await asyncio.get_running_loop().run_in_executor(
+        stt_pool, batch_transcribe.transcribe_array, audio, sample_rate
+    )
+
+
+def transcribe_batched(audio, sample_rate):
+    result = batched_model.transcribe(
+        to_whisper_rate(audio, sample_rate), without_timestamps=True
+    )
+    return result["text"].strip()
+
+
+def reply(sentences, speak):
+    """Each sentence, followed by its audio chunks when speaking."""
+    for sentence in sentences:
+        yield sentence
+        if speak:
+            yield from player.stream_pcm(sentence)
+
+
+async def run_turn(session, audio):
+    session.turn_number += 1
+    turn = session.turn_number
+    trace = f"{session.id}/{turn}"
+    started = time.perf_counter()
+    timings = {}
+    session.cancelled = cancelled = threading.Event()
+
+    def mark(name):
+        timings.setdefault(name, round((time.perf_counter() - started) * 1000, 1))
+
+    if ARCHIVE_WAV and len(audio):
+        path = os.path.join(SESSIONS_DIR, session.id, f"turn_{turn}.wav")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        await asyncio.to_thread(write_wav, path, audio, session.sample_rate)
+
+    text = ""
+    if len(audio):
+        seconds = len(audio) / session.sample_rate
+        with tracer.span("stt", trace=trace, audio_seconds=seconds):
+            text = await transcribe(audio, session.sample_rate)
+    mark("stt")
+    await session.send({"type": "transcript", "turn": turn, "text": text})
+
+    if session.answer and text and not cancelled.is_set():
+        history = (
+            session.conversation.context() if session.conversation is not None else None
+        )
+        pieces = tracer.traced(
+            "llm",
+            stream_answer(content=text, history=history),
+            trace=trace,
+            size=conversation.approx_tokens,
+            unit="tokens",
+        )
+        if session.conversation is not None:
+            pieces = session.conversation.record(text, pieces)
+        # The session's own copy of the last answer, not the GUI's file
+        pieces = saved(pieces, os.path.join(SESSIONS_DIR, session.id, "response.txt"))
+        items = background_iter(
+            reply(background_sentences(pieces, cancelled), session.speak),
+            cancelled,
+            maxsize=player.PREFETCH_CHUNKS,
+        )
+        try:
+            # The answer and its audio are produced on threads; hop off the
+            # event loop for each item so other sessions keep running
+            while (item := await asyncio.to_thread(next, items, None)) is not None:
+                if isinstance(item, bytes):
+                    mark("first_audio")
+                    await session.send(item)
+                else:
+                    mark("first_sentence")
+                    await session.send({"type": "sentence", "turn": turn, "text": item})
+        finally:
+            cancelled.set()  # stops the producers if we left early
+
+    mark("total")
+    await session.send({"type": "turn_end", "turn": turn, "timings_ms": timings})
+
+
+async def run_turns(session):
+    """Answer the session's utterances one after the other."""
+    while True:
+        audio = await session.turns.get()
+        try:
+            await run_turn(session, audio)
+        except WebSocketDisconnect:
+            return
+        except Exception as e:
+            print(f"Session {session.id} turn {session.turn_number}: {e}")
+            await session.send(
+                {"type": "error", "turn": session.turn_number, "message": str(e)}
+            )
+
+
+@app.websocket("/session")
+async def voice_session(
+    websocket: WebSocket,
+    sample_rate: int = SAMPLE_RATE,
+    answer: bool = True,
+    speak: bool = True,
+    endpointing: bool = True,
+):
+    await websocket.accept()
+    if len(sessions) >= MAX_SESSIONS:
+        await websocket.close(code=1013, reason="Too many sessions, try again later")
+        return
+
+    session = Session(websocket, sample_rate, answer, speak, endpointing)
+    sessions[session.id] = session
+    worker = asyncio.create_task(run_turns(session))
+    await session.send(
+        {
+            "type": "ready",
+            "session": session.id,
+            "audio_rate": player.PCM_RATE,
+            "audio_format": "pcm_s16le",
+        }
+    )
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                block = np.frombuffer(message["bytes"], dtype=np.float32)
+                utterance = session.feed(block)
+                if utterance is not None:
+                    session.turns.put_nowait(utterance)
+                continue
+            command = json.loads(message["text"]).get("type")
+            if command == "end":
+                # Always a turn, even without speech, so the client gets its
+                # turn_end
+                session.turns.put_nowait(session.take())
+            elif command == "cancel":
+                session.cancel()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.cancel()
+        worker.cancel()
+        del sessions[session.id]
+
+
+@app.get("/health")
+def health():
+    # Per-provider time to first token and error rate, as the router sees them
+    status = {"sessions": len(sessions), "llm_providers": get_router().summary()}
+    if batched_model is not None:
+        return {**status, "stt_batching": batched_model.stats()}
+    return {**status, "stt_workers": STT_WORKERS}
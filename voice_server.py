@@ -0,0 +1,26 @@
+"""
+WebSocket voice server: many people talking to the assistant at once.
+The server itself, and its protocol, are in voice_app.py.
+
+This script stays small on purpose: the speech-to-text workers are
+spawned processes, and spawning re-runs the main script in each of them.
+
+Usage:
+    python voice_server.py [--port 8004] [--workers N]
+"""
+
+import argparse
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8004)
+    parser.add_argument("--workers", type=int, help="speech-to-text processes")
+    args = parser.parse_args()
+
+    import uvicorn
+    import voice_app
+
+    if args.workers:
+        voice_app.STT_WORKERS = args.workers
+    uvicorn.run(voice_app.app, host=args.host, port=args.port)